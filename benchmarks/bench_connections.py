@@ -0,0 +1,124 @@
+"""
+Latency of the real search and OpenAI clients, cold versus warmed up.
+
+Cold runs create a new client for every request, as happened when a client was
+created per query, so each request pays for DNS, TCP and TLS again. Warm runs
+share one client, as the pipeline does, after ``warm_up`` opened its
+connections. Search goes through ``WebSearcher`` and DDGS with its primp
+clients, OpenAI through ``OpenAIClient`` listing the models, which costs no
+tokens. Needs network access; without an API key OpenAI answers 401, which still
+measures the round trip.
+
+    python benchmarks/bench_connections.py --requests 5
+"""
+
+import os
+import statistics
+import time
+from functools import partial
+from typing import Callable, List, Optional, Tuple
+
+import click
+from openai import APIStatusError
+
+from askweb.openai_client import OpenAIClient
+from askweb.search import SEARCH_REGION, WebSearcher
+
+QUERIES = (
+    "python release schedule",
+    "tls session resumption",
+    "http keep-alive",
+    "rust borrow checker",
+    "sqlite write ahead log",
+)
+
+
+def timed(fn: Callable[[], object]) -> Optional[float]:
+    """Milliseconds taken by ``fn``, None if it failed."""
+    started = time.perf_counter()
+    try:
+        fn()
+    except APIStatusError:
+        pass  # an error status still completed the round trip
+    except Exception as e:
+        click.echo(f"  request failed: {e}", err=True)
+        return None
+    return (time.perf_counter() - started) * 1000
+
+
+def measure_search(
+    requests: int, max_results: int, pause: float
+) -> Tuple[List[Optional[float]], List[Optional[float]]]:
+    def search(searcher: WebSearcher, query: str) -> None:
+        # The client directly, WebSearcher.search would add its own pacing
+        searcher.ddgs.text(
+            query, region=SEARCH_REGION, safesearch="off", max_results=max_results
+        )
+
+    cold: List[Optional[float]] = []
+    for i in range(requests):
+        with WebSearcher(max_results=max_results) as searcher:
+            cold.append(timed(partial(search, searcher, QUERIES[i % len(QUERIES)])))
+        time.sleep(pause)
+
+    warm: List[Optional[float]] = []
+    with WebSearcher(max_results=max_results) as searcher:
+        searcher.warm_up()
+        for i in range(requests):
+            warm.append(timed(partial(search, searcher, QUERIES[i % len(QUERIES)])))
+            time.sleep(pause)
+
+    return cold, warm
+
+
+def measure_openai(
+    api_key: str, requests: int
+) -> Tuple[List[Optional[float]], List[Optional[float]]]:
+    cold: List[Optional[float]] = []
+    for _ in range(requests):
+        with OpenAIClient(api_key) as client:
+            cold.append(timed(client.client.models.list))
+
+    with OpenAIClient(api_key) as client:
+        client.warm_up()
+        warm = [timed(client.client.models.list) for _ in range(requests)]
+
+    return cold, warm
+
+
+def report(
+    name: str, cold: List[Optional[float]], warm: List[Optional[float]]
+) -> float:
+    cold_ok = [t for t in cold if t is not None]
+    warm_ok = [t for t in warm if t is not None]
+    if not cold_ok or not warm_ok:
+        click.echo(f"{name:10}  failed")
+        return 0.0
+    saved = statistics.median(cold_ok) - statistics.median(warm_ok)
+    click.echo(
+        f"{name:10}{statistics.median(cold_ok):>10.1f}"
+        f"{statistics.median(warm_ok):>10.1f}{saved:>10.1f}"
+    )
+    return saved
+
+
+@click.command()
+@click.option("--requests", default=5, help="Requests per client and mode")
+@click.option("--max-results", default=10, help="Search results per query")
+@click.option("--pause", default=5.0, help="Seconds between searches")
+@click.option("--skip-search", is_flag=True, help="Only measure the OpenAI client")
+def main(requests: int, max_results: int, pause: float, skip_search: bool):
+    api_key = os.environ.get("OPENAI_API_KEY") or "benchmark"
+    click.echo(f"{requests} requests per client and mode, median ms")
+    click.echo(f"{'':10}{'cold':>10}{'warm':>10}{'saved':>10}")
+    saved_per_query = report("openai", *measure_openai(api_key, requests))
+    if not skip_search:
+        saved_per_query += report(
+            "search", *measure_search(requests, max_results, pause)
+        )
+    # A query makes at least one search and one OpenAI call
+    click.echo(f"saved per query: {saved_per_query:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Peak memory of holding the analyzed pages of one question.
+
+Compares keeping every relevant passage as ``AnalyzedContent`` in a list with the
+page store used by the CLI, for the collection stage and for building the answer
+prompt. As in the pipeline, workers extract full pages and keep only the passage
+the analysis found relevant, so the collection peak also includes the full pages
+in flight, which the page store does not bound. No network access is needed:
+pages are synthetic and the OpenAI calls are stubbed.
+
+Stage peaks are tracemalloc peaks, a proxy that counts the Python heap only.
+Each variant also runs in a fresh process whose peak RSS is reported, which
+includes the interpreter and imported modules as well.
+
+    python benchmarks/bench_memory.py --pages 200 --passage-kb 2 --memory-limit 1
+"""
+
+import multiprocessing
+import resource
+import sys
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, List, Sequence, Tuple
+from unittest.mock import patch
+
+import click
+
+from askweb.models import AnalyzedContent
+from askweb.openai_client import OpenAIClient
+from askweb.pagestore import PageStore
+
+
+def text(i: int, kb: int) -> str:
+    return (f"Paragraph {i}. " * kb * 100)[: kb * 1024]
+
+
+def analyze_page(i: int, page_kb: int, passage_kb: int) -> AnalyzedContent:
+    """Extracts a full page and keeps the relevant passage, like a worker."""
+    page = text(i, page_kb)
+    return AnalyzedContent(
+        title=f"Page {i}",
+        url=f"https://example.com/{i}",
+        published="2024-01-01",
+        is_relevant=True,
+        content=page[: passage_kb * 1024],
+    )
+
+
+def collect(
+    pages: int, page_kb: int, passage_kb: int, workers: int, keep: Callable
+) -> List:
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(lambda i: keep(analyze_page(i, page_kb, passage_kb)), i)
+            for i in range(pages)
+        ]
+        return [future.result() for future in futures]
+
+
+def measure(fn: Callable[[], object]) -> tuple[object, int]:
+    tracemalloc.start()
+    try:
+        result = fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, peak
+
+
+def build_prompt(sources: Sequence[AnalyzedContent]) -> int:
+    """Runs answer_question with the API call stubbed, returns the prompt size."""
+    client = OpenAIClient("benchmark")
+    prompt_size = 0
+
+    def fake_completion(system_prompt, user_content, **kwargs):
+        nonlocal prompt_size
+        prompt_size = len(user_content)
+        raise StopIteration
+
+    with patch.object(client, "_create_completion", side_effect=fake_completion):
+        try:
+            client.answer_question(sources, "benchmark question")
+        except StopIteration:
+            pass
+    return prompt_size
+
+
+def peak_rss() -> int:
+    """Peak resident set size of this process in bytes."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def run_list(
+    pages: int, page_kb: int, passage_kb: int, workers: int
+) -> Tuple[int, int, int, int]:
+    contents, collect_peak = measure(
+        partial(collect, pages, page_kb, passage_kb, workers, lambda page: page)
+    )
+    _, answer_peak = measure(partial(build_prompt, contents))
+    return collect_peak, answer_peak, 0, peak_rss()
+
+
+def run_store(
+    pages: int, page_kb: int, passage_kb: int, workers: int, memory_limit: int
+) -> Tuple[int, int, int, int]:
+    def collect_into_store():
+        store = PageStore(memory_limit=memory_limit)
+        records = collect(pages, page_kb, passage_kb, workers, store.add)
+        return store, records
+
+    (store, records), collect_peak = measure(collect_into_store)
+    with store:
+        _, answer_peak = measure(partial(build_prompt, store.contents(records)))
+        spilled = store.spilled
+    return collect_peak, answer_peak, spilled, peak_rss()
+
+
+def in_new_process(fn: Callable, *args) -> Tuple[int, int, int, int]:
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        return pool.apply(fn, args)
+
+
+@click.command()
+@click.option("--pages", default=200, help="Number of relevant pages")
+@click.option("--page-kb", default=64, help="Size of each extracted page in KB")
+@click.option("--passage-kb", default=2, help="Size of each relevant passage in KB")
+@click.option("--workers", default=8, help="Pages extracted in parallel")
+@click.option("--memory-limit", default=1, help="Page store memory limit in MB")
+def main(pages: int, page_kb: int, passage_kb: int, workers: int, memory_limit: int):
+    mb = 1024 * 1024
+    args = (pages, page_kb, passage_kb, workers)
+    results = {
+        "list": in_new_process(run_list, *args),
+        "page store": in_new_process(run_store, *args, memory_limit * mb),
+    }
+
+    click.echo(
+        f"{pages} pages x {page_kb} KB, {passage_kb} KB passages, "
+        f"{workers} workers, page store limit {memory_limit} MB"
+    )
+    click.echo(f"{'':12}{'collect':>12}{'answer':>12}{'peak RSS':>12}")
+    for name, (collect_peak, answer_peak, _, rss) in results.items():
+        click.echo(
+            f"{name:12}{collect_peak / mb:>10.1f}MB{answer_peak / mb:>10.1f}MB"
+            f"{rss / mb:>10.1f}MB"
+        )
+    spilled = results["page store"][2]
+    click.echo(f"{spilled} of {pages} pages spilled to disk")
+
+
+if __name__ == "__main__":
+    main()
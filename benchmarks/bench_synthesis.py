@@ -0,0 +1,103 @@
+"""
+Answer latency of single-shot synthesis versus map-reduce over source groups.
+
+Completion latency is simulated as a fixed overhead plus time per prompt and
+per generated token, so no network access is needed; the defaults are in the range of
+gpt-4o. Compares one prompt with all sources against parallel map calls over
+groups plus the reduce calls. Map-reduce pays an extra sequential call, so it
+only wins once the sources are large enough for prompt processing to dominate.
+
+    python benchmarks/bench_synthesis.py --sources 40 --source-tokens 1500
+"""
+
+import time
+from unittest.mock import patch
+
+import click
+
+from askweb.models import AnalyzedContent
+from askweb.openai_client import CHARS_PER_TOKEN, OpenAIClient
+from askweb.synthesis import synthesize_answer
+
+
+def make_source(i: int, source_tokens: int) -> AnalyzedContent:
+    return AnalyzedContent(
+        title=f"Source {i}",
+        url=f"https://example.com/{i}",
+        published="2024-01-01",
+        is_relevant=True,
+        content=(f"Fact {i}. " * source_tokens)[: source_tokens * CHARS_PER_TOKEN],
+    )
+
+
+@click.command()
+@click.option("--sources", default=40, help="Number of relevant sources")
+@click.option("--source-tokens", default=1500, help="Tokens per source")
+@click.option("--group-tokens", default=16_000, help="Token budget per map group")
+@click.option("--workers", default=8, help="Parallel map calls")
+@click.option("--overhead-ms", default=500, help="Fixed latency of a completion")
+@click.option("--prompt-us", default=150, help="Microseconds per prompt token")
+@click.option("--output-ms", default=15, help="Milliseconds per generated token")
+@click.option("--answer-tokens", default=400, help="Tokens in the final answer")
+@click.option("--partial-tokens", default=200, help="Tokens in each partial answer")
+def main(
+    sources: int,
+    source_tokens: int,
+    group_tokens: int,
+    workers: int,
+    overhead_ms: int,
+    prompt_us: int,
+    output_ms: int,
+    answer_tokens: int,
+    partial_tokens: int,
+):
+    client = OpenAIClient("benchmark")
+    prompt_tokens = 0
+
+    def fake_completion(system_prompt, user_content, response_format, **kwargs):
+        nonlocal prompt_tokens
+        fields = response_format.model_fields
+        output_tokens = partial_tokens if "used_sources" in fields else answer_tokens
+        tokens = len(user_content) // CHARS_PER_TOKEN
+        prompt_tokens += tokens
+        time.sleep(
+            overhead_ms / 1000
+            + tokens * prompt_us / 1e6
+            + output_tokens * output_ms / 1000
+        )
+
+        response = {"steps": [], "answer": "word " * output_tokens}
+        if "references" in fields:
+            response["references"] = []
+        if "used_sources" in fields:
+            response["used_sources"] = [1]
+        return response_format(**response)
+
+    contents = [make_source(i, source_tokens) for i in range(sources)]
+    results = {}
+    with patch.object(client, "_create_completion", side_effect=fake_completion):
+        for mode in ("single", "map-reduce"):
+            prompt_tokens = 0
+            started = time.perf_counter()
+            synthesize_answer(
+                client,
+                contents,
+                "benchmark question",
+                mode=mode,
+                group_tokens=group_tokens,
+                workers=workers,
+            )
+            results[mode] = (time.perf_counter() - started, prompt_tokens)
+
+    click.echo(
+        f"{sources} sources x {source_tokens} tokens, "
+        f"groups of {group_tokens} tokens, {workers} workers"
+    )
+    click.echo(f"{'':12}{'seconds':>10}{'prompt tokens':>16}")
+    for mode, (seconds, tokens) in results.items():
+        click.echo(f"{mode:12}{seconds:>10.2f}{tokens:>16,}")
+    click.echo(f"speedup {results['single'][0] / results['map-reduce'][0]:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
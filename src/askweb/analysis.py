@@ -1,14 +1,24 @@
-from typing import List, Optional
+from typing import Optional, Sequence
 
 from click import secho
 
 from askweb.models import AnalyzedContent, SearchResponse
 from askweb.openai_client import OpenAIClient
+from askweb.synthesis import DEFAULT_GROUP_TOKENS, synthesize_answer
 
 
 class ContentAnalyzer:
-    def __init__(self, openai_client: OpenAIClient):
+    def __init__(
+        self,
+        openai_client: OpenAIClient,
+        synthesis: str = "auto",
+        group_tokens: int = DEFAULT_GROUP_TOKENS,
+        workers: int = 4,
+    ):
         self.openai_client = openai_client
+        self.synthesis = synthesis
+        self.group_tokens = group_tokens
+        self.workers = workers
 
     def analyze_content(
         self, content: AnalyzedContent, question: str
@@ -33,7 +43,7 @@ class ContentAnalyzer:
         return None
 
     def create_search_response(
-        self, sources: List[AnalyzedContent], question: str
+        self, sources: Sequence[AnalyzedContent], question: str
     ) -> SearchResponse:
         """
         Creates a final search response with summary and answers.
@@ -48,4 +58,11 @@ class ContentAnalyzer:
         if not sources:
             return SearchResponse(summary="No relevant answers found.", answers=[])
 
-        return self.openai_client.answer_question(sources, question)
+        return synthesize_answer(
+            self.openai_client,
+            sources,
+            question,
+            mode=self.synthesis,
+            group_tokens=self.group_tokens,
+            workers=self.workers,
+        )
@@ -0,0 +1,145 @@
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import NamedTuple, Optional, Sequence
+
+from askweb.models import SearchResponse
+from askweb.storage import (
+    cosine_similarity,
+    default_cache_dir,
+    pack_vector,
+    unpack_vector,
+)
+
+# Paraphrases of the same question usually score above this
+CACHE_THRESHOLD = 0.92
+CACHE_MAX_AGE_DAYS = 7
+# How an answer was produced; only answers of the same mode are reused
+DEFAULT_MODE = "full"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS answers (
+    id INTEGER PRIMARY KEY,
+    question TEXT NOT NULL,
+    embedding BLOB NOT NULL,
+    response TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    mode TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS answers_created_at ON answers (created_at);
+CREATE TABLE IF NOT EXISTS stats (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+"""
+
+
+class CacheHit(NamedTuple):
+    response: SearchResponse
+    similarity: float
+
+
+class QuestionCache:
+    """
+    Cache of final answers keyed by the embedding of the question.
+
+    A lookup returns the stored response of the most similar question asked
+    within the age limit in the same answer mode, provided the similarity
+    clears the threshold. Hits and misses are counted in the database so the
+    hit rate covers all runs.
+    """
+
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        threshold: float = CACHE_THRESHOLD,
+        max_age_days: float = CACHE_MAX_AGE_DAYS,
+    ):
+        self.path = path or default_cache_dir() / "questions.sqlite"
+        self.threshold = threshold
+        self.max_age_days = max_age_days
+        self._lock = threading.Lock()
+
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.executescript(_SCHEMA)
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(answers)")}
+        if "mode" not in columns:
+            # Answers cached before modes were recorded are never reused
+            with self.conn:
+                self.conn.execute(
+                    "ALTER TABLE answers ADD COLUMN mode TEXT NOT NULL DEFAULT ''"
+                )
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def lookup(
+        self, embedding: Sequence[float], mode: str = DEFAULT_MODE
+    ) -> Optional[CacheHit]:
+        """
+        Finds a stored answer for a near-identical question.
+
+        Args:
+            embedding: Embedding of the new question
+            mode: Answer mode of the new question, e.g. ``full`` or ``fast``
+
+        Returns:
+            The best matching cached response or None on a miss
+        """
+        oldest = time.time() - self.max_age_days * 86400
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT embedding, response FROM answers "
+                "WHERE created_at >= ? AND mode = ?",
+                (oldest, mode),
+            ).fetchall()
+
+        best: Optional[CacheHit] = None
+        for vector, response in rows:
+            similarity = cosine_similarity(embedding, unpack_vector(vector))
+            if similarity >= self.threshold and (
+                best is None or similarity > best.similarity
+            ):
+                best = CacheHit(
+                    response=SearchResponse.model_validate_json(response),
+                    similarity=similarity,
+                )
+
+        self._count("hits" if best else "misses")
+        return best
+
+    def store(
+        self,
+        embedding: Sequence[float],
+        response: SearchResponse,
+        mode: str = DEFAULT_MODE,
+    ) -> None:
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO answers (question, embedding, response, created_at, mode) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    response.question,
+                    pack_vector(embedding),
+                    response.model_dump_json(),
+                    time.time(),
+                    mode,
+                ),
+            )
+
+    def stats(self) -> tuple[int, int]:
+        """Returns the number of hits and misses recorded so far."""
+        with self._lock:
+            counts = dict(self.conn.execute("SELECT key, value FROM stats"))
+        return counts.get("hits", 0), counts.get("misses", 0)
+
+    def hit_rate(self) -> float:
+        hits, misses = self.stats()
+        lookups = hits + misses
+        return hits / lookups if lookups else 0.0
+
+    def _count(self, key: str) -> None:
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO stats (key, value) VALUES (?, 1) "
+                "ON CONFLICT(key) DO UPDATE SET value = value + 1",
+                (key,),
+            )
@@ -1,5 +1,9 @@
 import os
+import sys
+from contextlib import nullcontext
+from pathlib import Path
 from textwrap import dedent
+from typing import Optional
 
 import click
 from rich.console import Console
@@ -7,20 +11,275 @@ from rich.markdown import Markdown
 from rich.panel import Panel
 from rich.progress import Progress, SpinnerColumn, TextColumn
 
-from askweb.analysis import ContentAnalyzer
-from askweb.content import ContentExtractor
-from askweb.openai_client import OpenAIClient
-from askweb.search import WebSearcher
+from askweb.cache import CACHE_MAX_AGE_DAYS, CACHE_THRESHOLD
+from askweb.content import BLOCK_HOURS, DEFAULT_MAX_BYTES
+from askweb.index import MAX_AGE_DAYS, MIN_LOCAL_SOURCES, MIN_SIMILARITY
+from askweb.models import PipelineEvent, SearchResponse
+from askweb.pagestore import DEFAULT_MEMORY_LIMIT
+from askweb.pipeline import DEFAULT_FETCH_BUDGET, PipelineOptions, ask
+from askweb.profiling import PROFILE_MODES, StageProfiler
+from askweb.synthesis import DEFAULT_GROUP_TOKENS, SYNTHESIS_MODES
 
 console = Console()
 
+STAGE_DESCRIPTIONS = {
+    "queries": "[bold green]Generating search queries...",
+    "search": "[cyan]Searching the web...",
+    "snippets": "[cyan]Checking search snippets...",
+    "analysis": "[cyan]Extracting and analyzing content...",
+    "answer": "[cyan]Compiling the answer...",
+}
+
+
+def format_response(response: SearchResponse) -> str:
+    result = dedent(f"""
+    # {response.question}
+
+    ## Answer
+    {response.answer}
+
+    ## References
+    """)
+
+    for reference in response.references:
+        result += f"- [{reference.title}]({reference.url})\n"
+    return result
+
+
+class RichRenderer:
+    """Shows pipeline events with spinners and panels in a terminal."""
+
+    def __init__(self, console: Console):
+        self.console = console
+        self.progress: Optional[Progress] = None
+        self.task = None
+
+    def __call__(self, event: PipelineEvent) -> None:
+        if event.kind == "start":
+            self.progress = Progress(
+                SpinnerColumn(),
+                TextColumn("[progress.description]{task.description}"),
+                console=self.console,
+            )
+            self.progress.start()
+            self.task = self.progress.add_task(
+                STAGE_DESCRIPTIONS.get(event.stage, event.stage),
+                total=event.data.get("total"),
+            )
+        elif event.kind == "progress":
+            if self.progress and self.task is not None:
+                self.progress.advance(self.task)
+            if event.message:
+                self.console.print(f"[dim]{event.message}[/dim]")
+        elif event.kind == "end":
+            if self.progress and self.task is not None:
+                self.progress.remove_task(self.task)
+                self.progress.stop()
+            self.progress = None
+            self.task = None
+            if event.stage == "queries":
+                # Show generated queries in a panel
+                self.console.print(
+                    Panel(
+                        "\n".join(f"• {query}" for query in event.data["queries"]),
+                        title="[bold]Search Queries[/bold]",
+                        title_align="left",
+                        expand=True,
+                    )
+                )
+        elif event.kind == "warning":
+            self.console.print(f"[red]{event.message}[/red]")
+        elif event.kind == "info":
+            self.console.print(f"[dim]{event.message}[/dim]")
+
+    def render(self, response: SearchResponse) -> None:
+        self.console.print(
+            Panel(
+                Markdown(format_response(response)),
+                title="Answer",
+                title_align="left",
+                expand=True,
+            )
+        )
+
+
+class PlainRenderer:
+    """Writes pipeline events as plain text, for output that is not a terminal."""
+
+    def __call__(self, event: PipelineEvent) -> None:
+        if event.kind == "end" and event.stage == "queries":
+            click.echo("Search queries:", err=True)
+            for query in event.data["queries"]:
+                click.echo(f"• {query}", err=True)
+        elif event.message and event.kind in ("progress", "info", "warning"):
+            click.echo(event.message, err=True)
+
+    def render(self, response: SearchResponse) -> None:
+        click.echo(format_response(response))
+
+
+def write_ndjson(event: PipelineEvent) -> None:
+    click.echo(event.model_dump_json())
+    sys.stdout.flush()
+
 
 @click.command()
 @click.argument("question")
 @click.option(
-    "--max-results", "-m", default=5, help="Maximum number of search results per query"
+    "--max-results",
+    "-m",
+    default=10,
+    help="Cap on the search results of a single query; the plan picks 1-10",
 )
-def main(question: str, max_results: int):
+@click.option(
+    "--max-fetches",
+    default=DEFAULT_FETCH_BUDGET,
+    help="Maximum number of unique search results fetched per question",
+)
+@click.option(
+    "--workers",
+    "-w",
+    default=8,
+    help="Maximum number of pages extracted and analyzed in parallel",
+)
+@click.option(
+    "--local-first",
+    is_flag=True,
+    help="Answer from previously analyzed sources when enough fresh ones match",
+)
+@click.option(
+    "--max-age",
+    default=MAX_AGE_DAYS,
+    help="Maximum age in days of previously analyzed sources used by --local-first",
+)
+@click.option(
+    "--local-threshold",
+    default=MIN_SIMILARITY,
+    help="Minimum similarity of an indexed passage to the question for --local-first",
+)
+@click.option(
+    "--local-min-sources",
+    default=MIN_LOCAL_SOURCES,
+    help="Matching indexed passages needed to skip the web search with --local-first",
+)
+@click.option(
+    "--refresh",
+    is_flag=True,
+    help="Ignore cached answers to similar questions and search again",
+)
+@click.option(
+    "--cache-threshold",
+    default=CACHE_THRESHOLD,
+    help="Minimum similarity of a previous question to reuse its answer",
+)
+@click.option(
+    "--cache-max-age",
+    default=CACHE_MAX_AGE_DAYS,
+    help="Maximum age in days of a reused answer",
+)
+@click.option(
+    "--memory-limit",
+    default=DEFAULT_MEMORY_LIMIT // (1024 * 1024),
+    help="Memory in MB for the relevant passages kept for the answer, the rest "
+    "is spilled to temporary files",
+)
+@click.option(
+    "--max-page-size",
+    default=DEFAULT_MAX_BYTES // (1024 * 1024),
+    help="Skip pages larger than this many MB",
+)
+@click.option(
+    "--block-hours",
+    default=BLOCK_HOURS,
+    help="Hours to skip a domain after it refused repeated downloads",
+)
+@click.option(
+    "--pdf", is_flag=True, help="Extract text from PDF documents (requires pypdf)"
+)
+@click.option(
+    "--max-sources",
+    type=int,
+    default=None,
+    help="Stop fetching pages once this many relevant sources are found",
+)
+@click.option(
+    "--per-host",
+    default=2,
+    help="Maximum number of concurrent fetches from the same host",
+)
+@click.option(
+    "--fast",
+    is_flag=True,
+    help="Answer from search snippets and only read pages if they are not enough",
+)
+@click.option(
+    "--synthesis",
+    type=click.Choice(SYNTHESIS_MODES),
+    default="auto",
+    help="Answer in one prompt or by map-reduce over groups of sources; "
+    "auto uses map-reduce when the sources do not fit one group",
+)
+@click.option(
+    "--group-tokens",
+    default=DEFAULT_GROUP_TOKENS,
+    help="Token budget of the sources in each map-reduce group",
+)
+@click.option(
+    "--resume",
+    is_flag=True,
+    help="Continue an interrupted run of the same question where it stopped",
+)
+@click.option(
+    "--warm-up",
+    is_flag=True,
+    help="Connect to OpenAI and the search engines while queries are generated",
+)
+@click.option(
+    "--profile",
+    type=click.Choice(PROFILE_MODES),
+    default=None,
+    help="Profile CPU time, memory or both for each pipeline stage",
+)
+@click.option(
+    "--profile-out",
+    type=click.Path(file_okay=False),
+    default="askweb-profile",
+    help="Directory for the profiling reports",
+)
+@click.option(
+    "--output",
+    "-o",
+    type=click.Choice(["text", "json", "ndjson"]),
+    default="text",
+    help="Output format; json and ndjson are meant for other programs",
+)
+def main(
+    question: str,
+    max_results: int,
+    max_fetches: int,
+    workers: int,
+    local_first: bool,
+    max_age: int,
+    local_threshold: float,
+    local_min_sources: int,
+    refresh: bool,
+    cache_threshold: float,
+    cache_max_age: float,
+    memory_limit: int,
+    max_page_size: int,
+    block_hours: float,
+    pdf: bool,
+    max_sources: Optional[int],
+    per_host: int,
+    fast: bool,
+    synthesis: str,
+    group_tokens: int,
+    resume: bool,
+    warm_up: bool,
+    profile: Optional[str],
+    profile_out: str,
+    output: str,
+):
     """Search the web and generate an answer to your question with sources."""
 
     api_key = os.getenv("OPENAI_API_KEY")
@@ -40,109 +299,46 @@ def main(question: str, max_results: int):
                 "API key saved! Restart your terminal for changes to take effect."
             )
 
-    openai_client = OpenAIClient(api_key)
-    searcher = WebSearcher(max_results=max_results)
-    extractor = ContentExtractor()
-
-    # Notify user the search queries are being generated
-    with Progress(
-        SpinnerColumn(),
-        TextColumn("[progress.description]{task.description}"),
-        console=console,
-    ) as progress:
-        task = progress.add_task("[bold green]Generating search queries...", total=None)
-        queries = openai_client.generate_search_queries(question)
-        progress.update(task, completed=True)
-
-    # Show generated queries in a panel
-    console.print(
-        Panel(
-            "\n".join(f"• {query}" for query in queries),
-            title="[bold]Search Queries[/bold]",
-            title_align="left",
-            expand=True,
-        )
-    )
-
-    # Collect all search results with progress bar
-    all_results = set()
-    with Progress(
-        SpinnerColumn(),
-        TextColumn("[progress.description]{task.description}"),
-        console=console,
-    ) as progress:
-        search_task = progress.add_task(
-            "[cyan]Searching the web...", total=len(queries)
-        )
-
-        for query in queries:
-            results = searcher.search(query)
-            all_results.update(results)
-            progress.advance(search_task)
-
-            # Show results count for each query
-            console.print(
-                f"[dim]Query: '{query}' returned {len(results)} results[/dim]"
-            )
-
-        # stop the progress bar
-        progress.remove_task(search_task)
-
-    # Initialize analyzer
-    analyzer = ContentAnalyzer(openai_client)
-
-    # Extract and analyze content
-    with Progress(
-        SpinnerColumn(),
-        TextColumn("[progress.description]{task.description}"),
-        console=console,
-    ) as progress:
-        analyze_task = progress.add_task(
-            "[cyan]Extracting and analyzing content...", total=len(all_results)
-        )
-        relevant_contents = []
-        for result in all_results:
-            content = extractor.extract(result)
-            if content:
-                candidate = analyzer.analyze_content(content, question)
-                if candidate and candidate.is_relevant:
-                    relevant_contents.append(candidate)
-                    # Show relevant content
-                    console.print(f"[dim]+ {candidate.title}[/dim]")
-                else:
-                    console.print(f"[dim]- {candidate.title}[/dim]")
-            progress.advance(analyze_task)
-
-        # stop the progress bar
-        progress.remove_task(analyze_task)
-
-    if not relevant_contents:
-        console.print("No relevant answers found.")
-        return
-
-    console.print(
-        f"[bold green]Found {len(relevant_contents)} relevant sources.[/bold green]"
+    options = PipelineOptions(
+        max_results=max_results,
+        max_fetches=max_fetches,
+        workers=workers,
+        local_first=local_first,
+        max_age=max_age,
+        local_threshold=local_threshold,
+        local_min_sources=local_min_sources,
+        refresh=refresh,
+        cache_threshold=cache_threshold,
+        cache_max_age=cache_max_age,
+        memory_limit=memory_limit * 1024 * 1024,
+        max_page_size=max_page_size * 1024 * 1024,
+        block_hours=block_hours,
+        pdf=pdf,
+        max_sources=max_sources,
+        per_host=per_host,
+        fast=fast,
+        resume=resume,
+        warm_up=warm_up,
+        synthesis=synthesis,
+        group_tokens=group_tokens,
     )
 
-    # Create response
-    response = analyzer.create_search_response(relevant_contents, question)
-
-    # Output results
-    result = dedent(f"""
-    # {response.question}
-
-    ## Answer
-    {response.answer}
-
-    ## References
-    """)
-
-    for reference in response.references:
-        result += f"- [{reference.title}]({reference.url})\n"
+    profiler = StageProfiler(profile, Path(profile_out)) if profile else nullcontext()
+    with profiler:
+        if output == "ndjson":
+            ask(question, options, api_key=api_key, on_event=write_ndjson)
+        elif output == "json":
+            result = ask(question, options, api_key=api_key)
+            click.echo(result.model_dump_json(indent=2))
+        else:
+            # Rich rendering only when a person is watching
+            renderer = RichRenderer(console) if sys.stdout.isatty() else PlainRenderer()
+            result = ask(question, options, api_key=api_key, on_event=renderer)
+            if result.response:
+                renderer.render(result.response)
 
-    console.print(
-        Panel(Markdown(result), title="Answer", title_align="left", expand=True)
-    )
+    if profile:
+        click.echo(f"Profiles written to {profile_out}", err=True)
 
 
 if __name__ == "__main__":
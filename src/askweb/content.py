@@ -1,37 +1,244 @@
-from typing import Optional
+import io
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional
+from urllib.parse import urlparse
 
 import trafilatura
 from click import secho
+from trafilatura.settings import use_config
 
+from askweb.fetch import USER_AGENT, FetchScheduler
+from askweb.metrics import RunMetrics
 from askweb.models import AnalyzedContent, SearchResult
+from askweb.storage import default_cache_dir
+
+try:
+    from pypdf import PdfReader
+except ImportError:  # optional dependency, install askweb[pdf]
+    PdfReader = None
+
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024
+# Long enough to skip a blocked domain for the rest of a session, short enough
+# that a site that only refused a burst of requests is retried the same day
+BLOCK_HOURS = 6
+PROBE_TIMEOUT = 5
+FETCH_TIMEOUT = 30
+
+HTML_CONTENT_TYPES = {"text/html", "application/xhtml+xml", "text/plain"}
+PDF_CONTENT_TYPE = "application/pdf"
+# Status codes that usually mean a login wall or bot protection
+BLOCKED_STATUS_CODES = {401, 402, 403, 407, 451}
+
+
+class ProbeResult(NamedTuple):
+    status: int
+    content_type: Optional[str]
+    content_length: Optional[int]
+
+
+def probe_url(url: str, timeout: float = PROBE_TIMEOUT) -> Optional[ProbeResult]:
+    """
+    Reads the response headers of a URL without downloading the body.
+
+    Tries a HEAD request first and falls back to a one byte ranged GET for
+    servers that do not support HEAD.
+
+    Returns:
+        ProbeResult or None if the server could not be reached
+    """
+    attempts = [("HEAD", {}), ("GET", {"Range": "bytes=0-0"})]
+    for method, headers in attempts:
+        request = urllib.request.Request(
+            url, method=method, headers={"User-Agent": USER_AGENT, **headers}
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                return _probe_result(response.status, response.headers)
+        except urllib.error.HTTPError as e:
+            if method == "HEAD" and e.code in (405, 501):
+                continue
+            return _probe_result(e.code, e.headers)
+        except (urllib.error.URLError, OSError, ValueError):
+            return None
+    return None
+
+
+def _probe_result(status: int, headers) -> ProbeResult:
+    content_type = headers.get("Content-Type")
+    if content_type:
+        content_type = content_type.split(";")[0].strip().lower()
+
+    # A ranged GET reports the full size as "bytes 0-0/<total>"
+    length = headers.get("Content-Range", "").rpartition("/")[2] or headers.get(
+        "Content-Length"
+    )
+    try:
+        content_length = int(length) if length else None
+    except ValueError:
+        content_length = None
+
+    return ProbeResult(status, content_type, content_length)
+
+
+class DomainBlocklist:
+    """
+    Domains skipped after repeated failures, persisted between runs.
+
+    A domain is blocked for ``block_hours`` once it fails ``threshold`` times
+    in a row; any successful extraction resets its count.
+    """
+
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        threshold: int = 3,
+        block_hours: float = BLOCK_HOURS,
+    ):
+        self.path = path or default_cache_dir() / "blocklist.json"
+        self.threshold = threshold
+        self.block_hours = block_hours
+        self._lock = threading.Lock()
+        self._failures: Dict[str, int] = {}
+        self._blocked_until: Dict[str, float] = {}
+        self._load()
+
+    def is_blocked(self, domain: str) -> bool:
+        with self._lock:
+            return self._blocked_until.get(domain, 0) > time.time()
+
+    def record_failure(self, domain: str) -> None:
+        with self._lock:
+            failures = self._failures.get(domain, 0) + 1
+            self._failures[domain] = failures
+            if failures >= self.threshold:
+                self._blocked_until[domain] = time.time() + self.block_hours * 3600
+                self._failures.pop(domain)
+            self._save()
+
+    def record_success(self, domain: str) -> None:
+        with self._lock:
+            if self._failures.pop(domain, None) is not None:
+                self._save()
+
+    def _load(self) -> None:
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        now = time.time()
+        self._failures = data.get("failures", {})
+        # Blocks saved with a longer block_hours end as if made with this one
+        longest = now + self.block_hours * 3600
+        self._blocked_until = {
+            domain: min(until, longest)
+            for domain, until in data.get("blocked_until", {}).items()
+            if until > now
+        }
+
+    def _save(self) -> None:
+        try:
+            with open(self.path, "w") as f:
+                json.dump(
+                    {"failures": self._failures, "blocked_until": self._blocked_until},
+                    f,
+                )
+        except OSError as e:
+            secho(f"Failed to save domain blocklist: {str(e)}", fg="red", err=True)
 
 
 class ContentExtractor:
+    def __init__(
+        self,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        blocklist: Optional[DomainBlocklist] = None,
+        metrics: Optional[RunMetrics] = None,
+        pdf: bool = False,
+        scheduler: Optional[FetchScheduler] = None,
+    ):
+        self.max_bytes = max_bytes
+        self.blocklist = blocklist or DomainBlocklist()
+        self.scheduler = scheduler or FetchScheduler()
+        self.metrics = metrics or RunMetrics()
+        self.pdf = pdf and PdfReader is not None
+        if pdf and PdfReader is None:
+            secho("PDF support requires pypdf: pip install askweb[pdf]", err=True)
+
+        # trafilatura stops downloading once MAX_FILE_SIZE bytes are read
+        self.config = use_config()
+        self.config.set("DEFAULT", "MAX_FILE_SIZE", str(max_bytes))
+
     def extract(self, search_result: SearchResult) -> Optional[AnalyzedContent]:
+        url = str(search_result.url)
+        domain = urlparse(url).hostname or ""
+
+        if self.blocklist.is_blocked(domain):
+            self._reject(url, "blocklisted")
+            return None
+        if not self.scheduler.is_available(domain):
+            self._reject(url, "unhealthy_host")
+            return None
+        if not self.scheduler.can_fetch(url):
+            self._reject(url, "robots")
+            return None
+
+        with self.scheduler.host_slot(domain):
+            return self._fetch_and_extract(search_result, url, domain)
+
+    def _fetch_and_extract(
+        self, search_result: SearchResult, url: str, domain: str
+    ) -> Optional[AnalyzedContent]:
+        probe = probe_url(url)
+        if probe:
+            if probe.content_type == PDF_CONTENT_TYPE and self.pdf:
+                return self._extract_pdf(search_result, url, domain)
+            reason = self._check_probe(probe)
+            if reason:
+                self._reject(url, reason)
+                return None
+        # An unreachable probe is inconclusive, and so is one refused by bot
+        # protection that often answers HEAD requests only with a 403; the
+        # download below decides and records the outcome once per URL
+
+        started = time.monotonic()
         try:
-            downloaded = trafilatura.fetch_url(str(search_result.url))
-            if downloaded:
-                content = trafilatura.extract(
-                    downloaded,
-                    include_links=False,
-                    include_images=False,
-                    include_comments=False,
-                    output_format="markdown",
-                    with_metadata=False,
-                )
-                metadata = trafilatura.extract_metadata(downloaded)
-
-                if content:
-                    return AnalyzedContent(
-                        title=metadata.title,
-                        url=search_result.url,
-                        published=metadata.date if metadata.date else None,
-                        is_relevant=False,  # Will be set by analyzer
-                        content=content,
-                    )
-            # failed to extract content
-            secho(
-                f"Failed to extract content for {search_result.url}", fg="red", err=True
+            response = trafilatura.fetch_response(url, decode=True, config=self.config)
+        except Exception as e:
+            response = None
+            error = str(e)
+        else:
+            error = None if response else "no response"
+        status = response.status if response else None
+        if not self._check_download(url, domain, status, started, error):
+            return None
+
+        try:
+            content = trafilatura.extract(
+                response.html,
+                include_links=False,
+                include_images=False,
+                include_comments=False,
+                output_format="markdown",
+                with_metadata=False,
+            )
+            if not content:
+                # Thin or script-rendered pages say nothing about the domain
+                self._reject(url, "no_text")
+                return None
+
+            metadata = trafilatura.extract_metadata(response.html)
+            self.blocklist.record_success(domain)
+            return AnalyzedContent(
+                title=metadata.title,
+                url=search_result.url,
+                published=metadata.date if metadata.date else None,
+                is_relevant=False,  # Will be set by analyzer
+                content=content,
             )
         except Exception as e:
             secho(
@@ -40,4 +247,105 @@ class ContentExtractor:
                 err=True,
             )
 
+        self.metrics.increment("extraction.failed")
+        return None
+
+    def _check_download(
+        self,
+        url: str,
+        domain: str,
+        status: Optional[int],
+        started: float,
+        error: Optional[str] = None,
+    ) -> bool:
+        """
+        Records the outcome of a download for the host and the domain.
+
+        Args:
+            status: HTTP status, None if the download got no response
+            started: ``time.monotonic()`` when the download started
+            error: Why there was no response, for the message
+
+        Returns:
+            True if the response holds a document worth extracting
+        """
+        # Only timeouts, connection errors and server errors say the host is
+        # unhealthy; a dead link or a refusal is an answer from a healthy one.
+        # trafilatura also gives no response for a body over MAX_FILE_SIZE, most
+        # of those are caught by the probe's Content-Length first
+        if status is None or status >= 500:
+            self.scheduler.record_failure(domain)
+        else:
+            self.scheduler.record_success(domain, time.monotonic() - started)
+
+        if status in BLOCKED_STATUS_CODES:
+            # The real download was refused too, a login wall or bot protection
+            self._reject(url, "forbidden")
+            self.blocklist.record_failure(domain)
+            return False
+        if status != 200:
+            reason = error or f"HTTP {status}"
+            secho(f"Failed to download {url}: {reason}", fg="red", err=True)
+            self.metrics.increment("extraction.failed")
+            return False
+        return True
+
+    def _check_probe(self, probe: ProbeResult) -> Optional[str]:
+        """Returns the reason to skip a URL or None if it is worth fetching."""
+        if probe.content_type and probe.content_type not in HTML_CONTENT_TYPES:
+            return "content_type"
+        if probe.content_length and probe.content_length > self.max_bytes:
+            return "too_large"
+        return None
+
+    def _reject(self, url: str, reason: str) -> None:
+        self.metrics.increment(f"rejected.{reason}")
+        secho(f"Skipped {url}: {reason.replace('_', ' ')}", fg="yellow", err=True)
+
+    def _extract_pdf(
+        self, search_result: SearchResult, url: str, domain: str
+    ) -> Optional[AnalyzedContent]:
+        started = time.monotonic()
+        error = None
+        try:
+            request = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
+            with urllib.request.urlopen(request, timeout=FETCH_TIMEOUT) as response:
+                status = response.status
+                data = response.read(self.max_bytes + 1)
+        except urllib.error.HTTPError as e:
+            status = e.code
+        except (urllib.error.URLError, OSError, ValueError) as e:
+            status, error = None, str(e)
+        if not self._check_download(url, domain, status, started, error):
+            return None
+        if len(data) > self.max_bytes:
+            self._reject(url, "too_large")
+            return None
+
+        try:
+            reader = PdfReader(io.BytesIO(data))
+            content = "\n\n".join(page.extract_text() or "" for page in reader.pages)
+            if not content.strip():
+                self._reject(url, "no_text")
+                return None
+
+            metadata = reader.metadata
+            created = metadata.creation_date if metadata else None
+            self.metrics.increment("extraction.pdf")
+            self.blocklist.record_success(domain)
+            return AnalyzedContent(
+                title=(metadata.title if metadata else None) or search_result.title,
+                url=search_result.url,
+                published=created.strftime("%Y-%m-%d") if created else None,
+                is_relevant=False,  # Will be set by analyzer
+                content=content,
+            )
+        except Exception as e:
+            secho(
+                f"PDF extraction error for {search_result.url}: {str(e)}",
+                fg="red",
+                err=True,
+            )
+
+        self.metrics.increment("extraction.failed")
         return None
@@ -0,0 +1,230 @@
+import json
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+
+from click import secho
+
+from askweb.models import SearchResult
+from askweb.storage import default_cache_dir
+
+USER_AGENT = "Mozilla/5.0 (compatible; askweb)"
+ROBOTS_AGENT = "askweb"
+ROBOTS_TIMEOUT = 5
+ROBOTS_TTL = 3600
+
+# Weight of the newest sample in the exponentially weighted latency average
+LATENCY_SMOOTHING = 0.3
+DEFAULT_LATENCY = 2.0
+
+
+@dataclass(slots=True)
+class HostState:
+    """Health of a single host as seen by the scheduler."""
+
+    latency: Optional[float] = None
+    samples: int = 0
+    consecutive_failures: int = 0
+    open_until: float = 0.0
+
+
+class FetchScheduler:
+    """
+    Politeness and host health policy for page fetches.
+
+    - at most ``per_host`` concurrent fetches to the same host
+    - robots.txt is fetched once per host and cached for ``ROBOTS_TTL``
+    - a circuit breaker skips a host for ``cooldown`` seconds after
+      ``failure_threshold`` consecutive timeouts, connection errors or server
+      errors, then lets a single trial request through
+    - fetch latency per host is averaged and persisted, so likely-fast hosts
+      can be fetched first
+    """
+
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        per_host: int = 2,
+        failure_threshold: int = 3,
+        cooldown: float = 60.0,
+        respect_robots: bool = True,
+    ):
+        self.path = path or default_cache_dir() / "hosts.json"
+        self.per_host = per_host
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.respect_robots = respect_robots
+
+        self._lock = threading.Lock()
+        self._slots: Dict[str, threading.Semaphore] = defaultdict(
+            lambda: threading.BoundedSemaphore(self.per_host)
+        )
+        self._robots: Dict[str, tuple[float, Optional[RobotFileParser]]] = {}
+        self._robots_locks: Dict[str, threading.Lock] = defaultdict(threading.Lock)
+        self._hosts: Dict[str, HostState] = {}
+        self._load()
+
+    @staticmethod
+    def host(url: str) -> str:
+        return urlparse(url).hostname or ""
+
+    @contextmanager
+    def host_slot(self, host: str) -> Iterator[None]:
+        """Holds one of the host's concurrent fetch slots."""
+        with self._lock:
+            slot = self._slots[host]
+        with slot:
+            yield
+
+    def is_available(self, host: str) -> bool:
+        """
+        False while the host's circuit is open.
+
+        Once the cooldown has passed, only the first caller gets through as
+        the trial request: the circuit stays closed to everyone else until
+        that request records a success or failure, or for another cooldown
+        if it never does.
+        """
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None or not state.open_until:
+                return True
+            now = time.time()
+            if state.open_until > now:
+                return False
+            state.open_until = now + self.cooldown
+            return True
+
+    def record_success(self, host: str, latency: float) -> None:
+        with self._lock:
+            state = self._state(host)
+            state.consecutive_failures = 0
+            state.open_until = 0.0
+            if state.latency is None:
+                state.latency = latency
+            else:
+                state.latency += LATENCY_SMOOTHING * (latency - state.latency)
+            state.samples += 1
+
+    def record_failure(self, host: str) -> None:
+        with self._lock:
+            state = self._state(host)
+            state.consecutive_failures += 1
+            if state.consecutive_failures >= self.failure_threshold:
+                # Half-open after the cooldown: the next failure reopens at once
+                state.consecutive_failures = self.failure_threshold - 1
+                state.open_until = time.time() + self.cooldown
+
+    def expected_latency(self, host: str) -> float:
+        with self._lock:
+            return self._expected_latency(host)
+
+    def can_fetch(self, url: str) -> bool:
+        """Checks the host's robots.txt, fetching it on first use."""
+        if not self.respect_robots:
+            return True
+
+        parsed = urlparse(url)
+        origin = f"{parsed.scheme}://{parsed.netloc}"
+        with self._lock:
+            robots_lock = self._robots_locks[origin]
+        with robots_lock:
+            fetched_at, parser = self._robots.get(origin, (0.0, None))
+            if time.time() - fetched_at > ROBOTS_TTL:
+                parser = self._fetch_robots(origin)
+                self._robots[origin] = (time.time(), parser)
+
+        return parser is None or parser.can_fetch(ROBOTS_AGENT, url)
+
+    def order(self, results: Iterable[SearchResult]) -> List[SearchResult]:
+        """
+        Orders results so likely-fast, healthy hosts are fetched first.
+
+        Results are spread across hosts round-robin, so a worker pool is not
+        filled with fetches waiting for the same host's slots.
+        """
+        by_host: Dict[str, List[SearchResult]] = defaultdict(list)
+        for result in sorted(results):
+            by_host[self.host(str(result.url))].append(result)
+
+        with self._lock:
+            now = time.time()
+            hosts = sorted(
+                by_host,
+                key=lambda host: (
+                    host in self._hosts and self._hosts[host].open_until > now,
+                    self._expected_latency(host),
+                ),
+            )
+
+        ordered = []
+        for rank in range(max((len(r) for r in by_host.values()), default=0)):
+            ordered.extend(
+                by_host[host][rank] for host in hosts if rank < len(by_host[host])
+            )
+        return ordered
+
+    def save(self) -> None:
+        """Persists the latency history for later runs."""
+        with self._lock:
+            data = {
+                host: {"latency": state.latency, "samples": state.samples}
+                for host, state in self._hosts.items()
+                if state.latency is not None
+            }
+        try:
+            with open(self.path, "w") as f:
+                json.dump(data, f)
+        except OSError as e:
+            secho(f"Failed to save host history: {str(e)}", fg="red", err=True)
+
+    def _state(self, host: str) -> HostState:
+        if host not in self._hosts:
+            self._hosts[host] = HostState()
+        return self._hosts[host]
+
+    def _expected_latency(self, host: str) -> float:
+        state = self._hosts.get(host)
+        if state and state.latency is not None:
+            return state.latency
+        # Unknown hosts are assumed to be typical
+        known = [s.latency for s in self._hosts.values() if s.latency is not None]
+        return statistics.median(known) if known else DEFAULT_LATENCY
+
+    def _fetch_robots(self, origin: str) -> Optional[RobotFileParser]:
+        parser = RobotFileParser(f"{origin}/robots.txt")
+        try:
+            request = urllib.request.Request(
+                parser.url, headers={"User-Agent": USER_AGENT}
+            )
+            with urllib.request.urlopen(request, timeout=ROBOTS_TIMEOUT) as response:
+                parser.parse(response.read().decode("utf-8", "ignore").splitlines())
+        except urllib.error.HTTPError as e:
+            # Same policy as RobotFileParser.read()
+            if e.code in (401, 403):
+                parser.disallow_all = True
+            else:
+                return None
+        except (urllib.error.URLError, OSError, ValueError):
+            return None
+        return parser
+
+    def _load(self) -> None:
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        for host, entry in data.items():
+            self._hosts[host] = HostState(
+                latency=entry.get("latency"), samples=entry.get("samples", 0)
+            )
@@ -0,0 +1,268 @@
+import json
+import random
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Iterable, List, NamedTuple, Optional, Sequence, Set
+
+from askweb.models import AnalyzedContent
+from askweb.storage import (
+    cosine_similarity,
+    default_cache_dir,
+    pack_vector,
+    unpack_vector,
+)
+
+# Below this size a full scan is cheap and more accurate than LSH lookups
+EXACT_SEARCH_LIMIT = 512
+
+# Defaults for answering from the index without a web search
+MIN_SIMILARITY = 0.55
+MIN_LOCAL_SOURCES = 3
+MAX_AGE_DAYS = 30
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value BLOB);
+CREATE TABLE IF NOT EXISTS passages (
+    id INTEGER PRIMARY KEY,
+    url TEXT UNIQUE NOT NULL,
+    title TEXT NOT NULL,
+    published TEXT,
+    content TEXT NOT NULL,
+    embedding BLOB NOT NULL,
+    indexed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS buckets (
+    table_no INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    passage_id INTEGER NOT NULL REFERENCES passages(id) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS buckets_lookup ON buckets (table_no, bucket);
+CREATE INDEX IF NOT EXISTS buckets_passage ON buckets (passage_id);
+"""
+
+
+class IndexMatch(NamedTuple):
+    content: AnalyzedContent
+    similarity: float
+
+
+def is_fresh(
+    published: Optional[str], indexed_at: float, max_age_days: Optional[float]
+) -> bool:
+    """
+    Checks whether a passage is recent enough to be reused.
+
+    Age is judged from the publication date; passages without a parseable date
+    fall back to the time they were indexed.
+    """
+    if max_age_days is None:
+        return True
+
+    timestamp = indexed_at
+    if published:
+        try:
+            timestamp = datetime.fromisoformat(published[:10]).timestamp()
+        except ValueError:
+            pass
+
+    return datetime.now() - datetime.fromtimestamp(timestamp) <= timedelta(
+        days=max_age_days
+    )
+
+
+class ContentIndex:
+    """
+    On-disk semantic index of relevant passages from earlier runs.
+
+    Passages are stored in SQLite with their embeddings. Approximate nearest
+    neighbour lookups use random-hyperplane LSH: every passage is hashed into
+    one bucket per table and a query only scores passages sharing a bucket.
+    """
+
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        num_tables: int = 8,
+        num_bits: int = 12,
+        seed: int = 0,
+    ):
+        self.path = path or default_cache_dir() / "index.sqlite"
+        self.num_tables = num_tables
+        self.num_bits = num_bits
+        self.seed = seed
+        self._planes: Optional[List[List[Sequence[float]]]] = None
+        self._lock = threading.Lock()
+
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM passages").fetchone()[0]
+
+    def add(self, content: AnalyzedContent, embedding: Sequence[float]) -> None:
+        """Stores a relevant passage, replacing any earlier one for the URL."""
+        if not content.content:
+            return
+
+        with self._lock, self.conn:
+            planes = self._get_planes(len(embedding))
+            cursor = self.conn.execute(
+                """
+                INSERT INTO passages
+                    (url, title, published, content, embedding, indexed_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(url) DO UPDATE SET
+                    title = excluded.title,
+                    published = excluded.published,
+                    content = excluded.content,
+                    embedding = excluded.embedding,
+                    indexed_at = excluded.indexed_at
+                RETURNING id
+                """,
+                (
+                    str(content.url),
+                    content.title,
+                    content.published,
+                    content.content,
+                    pack_vector(embedding),
+                    time.time(),
+                ),
+            )
+            passage_id = cursor.fetchone()[0]
+            self.conn.execute("DELETE FROM buckets WHERE passage_id = ?", (passage_id,))
+            self.conn.executemany(
+                "INSERT INTO buckets (table_no, bucket, passage_id) VALUES (?, ?, ?)",
+                [
+                    (table_no, bucket, passage_id)
+                    for table_no, bucket in enumerate(self._hash(planes, embedding))
+                ],
+            )
+
+    def add_many(
+        self,
+        contents: Iterable[AnalyzedContent],
+        embeddings: Iterable[Sequence[float]],
+    ) -> None:
+        for content, embedding in zip(contents, embeddings, strict=True):
+            self.add(content, embedding)
+
+    def search(
+        self,
+        embedding: Sequence[float],
+        limit: int = 5,
+        min_similarity: float = 0.0,
+        max_age_days: Optional[float] = None,
+    ) -> List[IndexMatch]:
+        """
+        Finds the stored passages most similar to the embedding.
+
+        Args:
+            embedding: Query embedding
+            limit: Maximum number of matches to return
+            min_similarity: Minimum cosine similarity of a match
+            max_age_days: Skip passages older than this, see ``is_fresh``
+
+        Returns:
+            Matches ordered by decreasing similarity
+        """
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT id, url, title, published, content, embedding, indexed_at "
+                "FROM passages WHERE id IN (SELECT value FROM json_each(?))",
+                (json.dumps(sorted(self._candidates(embedding))),),
+            ).fetchall()
+
+        matches = []
+        for _, url, title, published, content, vector, indexed_at in rows:
+            similarity = cosine_similarity(embedding, unpack_vector(vector))
+            if similarity < min_similarity:
+                continue
+            if not is_fresh(published, indexed_at, max_age_days):
+                continue
+            matches.append(
+                IndexMatch(
+                    content=AnalyzedContent(
+                        title=title,
+                        url=url,
+                        published=published,
+                        is_relevant=True,
+                        content=content,
+                    ),
+                    similarity=similarity,
+                )
+            )
+
+        matches.sort(key=lambda match: match.similarity, reverse=True)
+        return matches[:limit]
+
+    def _candidates(self, embedding: Sequence[float]) -> Set[int]:
+        count = self.conn.execute("SELECT COUNT(*) FROM passages").fetchone()[0]
+        if count <= EXACT_SEARCH_LIMIT:
+            return {row[0] for row in self.conn.execute("SELECT id FROM passages")}
+
+        planes = self._get_planes(len(embedding))
+        candidates: Set[int] = set()
+        for table_no, bucket in enumerate(self._hash(planes, embedding)):
+            candidates.update(
+                row[0]
+                for row in self.conn.execute(
+                    "SELECT passage_id FROM buckets WHERE table_no = ? AND bucket = ?",
+                    (table_no, bucket),
+                )
+            )
+        return candidates
+
+    def _hash(
+        self, planes: List[List[Sequence[float]]], embedding: Sequence[float]
+    ) -> List[int]:
+        buckets = []
+        for table in planes:
+            bucket = 0
+            for plane in table:
+                dot = sum(p * x for p, x in zip(plane, embedding, strict=True))
+                bucket = (bucket << 1) | (dot >= 0)
+            buckets.append(bucket)
+        return buckets
+
+    def _get_planes(self, dimensions: int) -> List[List[Sequence[float]]]:
+        """Loads the LSH hyperplanes, generating and persisting them on first use."""
+        if self._planes is not None:
+            return self._planes
+
+        row = self.conn.execute(
+            "SELECT value FROM meta WHERE key = 'planes'"
+        ).fetchone()
+        if row:
+            flat = unpack_vector(row[0])
+            dimensions = len(flat) // (self.num_tables * self.num_bits)
+        else:
+            rng = random.Random(self.seed)
+            flat = [
+                rng.gauss(0.0, 1.0)
+                for _ in range(self.num_tables * self.num_bits * dimensions)
+            ]
+            self.conn.execute(
+                "INSERT INTO meta (key, value) VALUES ('planes', ?)",
+                (pack_vector(flat),),
+            )
+
+        self._planes = [
+            [
+                flat[offset : offset + dimensions]
+                for offset in range(
+                    (table * self.num_bits) * dimensions,
+                    (table + 1) * self.num_bits * dimensions,
+                    dimensions,
+                )
+            ]
+            for table in range(self.num_tables)
+        ]
+        return self._planes
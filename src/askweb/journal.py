@@ -0,0 +1,128 @@
+import hashlib
+import json
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from click import secho
+
+from askweb.models import AnalyzedContent, PlannedQuery, SearchResult
+from askweb.storage import default_cache_dir
+
+
+class RunJournal:
+    """
+    Work completed so far for one question, so an interrupted run can resume.
+
+    Entries are appended to a JSON lines file as each item finishes: the
+    generated queries, the results of every search query and the analysis of
+    every page. A run that dies halfway leaves the file behind and
+    ``resume=True`` replays it; a run that completes deletes it.
+    """
+
+    def __init__(
+        self, question: str, path: Optional[Path] = None, resume: bool = False
+    ):
+        if path is None:
+            digest = hashlib.sha256(question.encode()).hexdigest()[:16]
+            path = default_cache_dir() / "runs" / f"{digest}.jsonl"
+        self.path = path
+        self.question = question
+        self._lock = threading.Lock()
+
+        self.queries: Optional[List[PlannedQuery]] = None
+        self.search_results: Dict[str, List[SearchResult]] = {}
+        self.pages: Dict[str, AnalyzedContent] = {}
+
+        if resume:
+            self._load()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "a" if resume else "w")
+        if resume and self._file.tell() and not self._ends_with_newline():
+            self._file.write("\n")
+
+    def __enter__(self) -> "RunJournal":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    @property
+    def is_empty(self) -> bool:
+        return self.queries is None and not self.search_results and not self.pages
+
+    def record_queries(self, queries: List[PlannedQuery]) -> None:
+        self.queries = list(queries)
+        self._append(
+            {
+                "type": "queries",
+                "queries": [query.model_dump() for query in queries],
+            }
+        )
+
+    def record_search(self, query: str, results: List[SearchResult]) -> None:
+        self.search_results[query] = list(results)
+        self._append(
+            {
+                "type": "search",
+                "query": query,
+                "results": [result.model_dump(mode="json") for result in results],
+            }
+        )
+
+    def record_page(self, content: AnalyzedContent) -> None:
+        """Records the analysis of a page; only relevant passages are kept."""
+        url = str(content.url)
+        if not content.is_relevant:
+            content = content.model_copy(update={"content": None})
+        self.pages[url] = content
+        self._append({"type": "page", "page": content.model_dump(mode="json")})
+
+    def complete(self) -> None:
+        """Deletes the journal once the question has been answered."""
+        self.close()
+        self.path.unlink(missing_ok=True)
+
+    def close(self) -> None:
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+    def _append(self, entry: dict) -> None:
+        with self._lock:
+            if self._file.closed:
+                return
+            try:
+                self._file.write(json.dumps(entry) + "\n")
+                # Flushed per entry, so a crash loses at most the current item
+                self._file.flush()
+            except OSError as e:
+                secho(f"Failed to update run journal: {str(e)}", fg="red", err=True)
+
+    def _ends_with_newline(self) -> bool:
+        with open(self.path, "rb") as f:
+            f.seek(-1, 2)
+            return f.read(1) == b"\n"
+
+    def _load(self) -> None:
+        try:
+            with open(self.path) as f:
+                lines = f.readlines()
+        except OSError:
+            return
+
+        for line in lines:
+            try:
+                entry = json.loads(line)
+                if entry["type"] == "queries":
+                    self.queries = [PlannedQuery(**query) for query in entry["queries"]]
+                elif entry["type"] == "search":
+                    self.search_results[entry["query"]] = [
+                        SearchResult(**result) for result in entry["results"]
+                    ]
+                elif entry["type"] == "page":
+                    page = AnalyzedContent(**entry["page"])
+                    self.pages[str(page.url)] = page
+            except (ValueError, KeyError, TypeError):
+                # A run killed mid-write leaves a truncated last line
+                continue
@@ -0,0 +1,32 @@
+import threading
+from collections import Counter
+from typing import Dict
+
+
+class RunMetrics:
+    """Thread-safe counters collected over a single run."""
+
+    def __init__(self):
+        self._counts: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def increment(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counts[name] += amount
+
+    def get(self, name: str) -> int:
+        with self._lock:
+            return self._counts[name]
+
+    def with_prefix(self, prefix: str) -> Dict[str, int]:
+        """Returns the counters under ``prefix.``, keyed without the prefix."""
+        with self._lock:
+            return {
+                name[len(prefix) + 1 :]: count
+                for name, count in self._counts.items()
+                if name.startswith(f"{prefix}.")
+            }
+
+    def as_dict(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counts)
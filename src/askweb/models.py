@@ -1,6 +1,7 @@
-from typing import List, Optional
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
 
-from pydantic import BaseModel, HttpUrl
+from pydantic import BaseModel, Field, HttpUrl
 
 
 class SearchResult(BaseModel):
@@ -21,6 +22,12 @@ class SearchResult(BaseModel):
         return self.url > other.url
 
 
+class PlannedQuery(BaseModel):
+    query: str
+    priority: int
+    expected_results: int
+
+
 class AnalyzedContent(BaseModel):
     title: str
     url: HttpUrl
@@ -29,6 +36,17 @@ class AnalyzedContent(BaseModel):
     content: Optional[str]
 
 
+@dataclass(slots=True)
+class PageRecord:
+    """Compact form of ``AnalyzedContent`` whose body lives in a ``PageStore``."""
+
+    title: str
+    url: str
+    published: Optional[str]
+    is_relevant: bool
+    body_key: Optional[str]
+
+
 class Reference(BaseModel):
     title: str
     url: HttpUrl
@@ -38,3 +56,25 @@ class SearchResponse(BaseModel):
     question: str
     answer: str
     references: List[Reference]
+
+
+class PartialAnswer(BaseModel):
+    """Answer drawn from a group of sources, combined into the final answer."""
+
+    answer: str
+    references: List[Reference]
+
+
+class PipelineEvent(BaseModel):
+    stage: str
+    kind: str
+    message: str = ""
+    data: Dict[str, Any] = Field(default_factory=dict)
+    elapsed: float
+
+
+class PipelineResult(BaseModel):
+    question: str
+    response: Optional[SearchResponse]
+    events: List[PipelineEvent]
+    metrics: Dict[str, int]
@@ -1,15 +1,49 @@
-from typing import Any, List, Optional
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Iterable, List, Optional, Sequence
 
-from openai import OpenAI
+from openai import (
+    APIConnectionError,
+    APITimeoutError,
+    InternalServerError,
+    OpenAI,
+    RateLimitError,
+)
 from pydantic import BaseModel, Field
 
-from askweb.models import AnalyzedContent, Reference, SearchResponse
+from askweb.models import (
+    AnalyzedContent,
+    PartialAnswer,
+    PlannedQuery,
+    Reference,
+    SearchResponse,
+    SearchResult,
+)
 from askweb.prompts import (
     ANSWER_GENERATION_PROMPT,
+    COMBINE_ANSWERS_PROMPT,
     QUERY_GENERATION_PROMPT,
     RELEVANCE_ANALYSIS_PROMPT,
+    SNIPPET_ANSWER_PROMPT,
+    SOURCE_SUMMARY_PROMPT,
     SYSTEM_PROMPT,
 )
+from askweb.ratelimit import RateLimitScheduler
+
+# Errors worth retrying; everything else is surfaced to the caller immediately
+RETRYABLE_ERRORS = (
+    APIConnectionError,
+    APITimeoutError,
+    InternalServerError,
+    RateLimitError,
+)
+
+# Rough token estimate used to reserve tokens-per-minute budget before a call
+CHARS_PER_TOKEN = 4
+COMPLETION_TOKEN_ALLOWANCE = 1000
+EMBEDDING_MAX_CHARS = 24000
+WARM_UP_TIMEOUT = 5
 
 
 # pydantic data model for chain of thoughts
@@ -19,9 +53,47 @@ class Step(BaseModel):
 
 
 class OpenAIClient:
-    def __init__(self, api_key: str):
-        self.client = OpenAI(api_key=api_key)
+    def __init__(
+        self,
+        api_key: str,
+        scheduler: Optional[RateLimitScheduler] = None,
+        max_retries: int = 6,
+    ):
+        # Retries are handled by the scheduler, not by the SDK
+        self.client = OpenAI(api_key=api_key, max_retries=0)
         self.model = "gpt-4o"
+        self.embedding_model = "text-embedding-3-small"
+        self.scheduler = scheduler or RateLimitScheduler()
+        # Embedding models have their own rate limit budgets
+        self.embedding_scheduler = RateLimitScheduler()
+        self.max_retries = max_retries
+
+    def __enter__(self) -> "OpenAIClient":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Closes the pooled connections of the underlying client."""
+        self.client.close()
+
+    def warm_up(self, connections: int = 1) -> None:
+        """
+        Opens pooled connections to the API ahead of the calls that need them.
+
+        Uses the model list, which costs no tokens. Every concurrent request
+        leaves one more TLS connection in the pool for parallel calls later.
+        """
+
+        def connect(_: int) -> None:
+            try:
+                self.client.with_options(timeout=WARM_UP_TIMEOUT).models.list()
+            except Exception:
+                pass  # the real call will report the problem
+
+        with ThreadPoolExecutor(max_workers=max(1, connections)) as executor:
+            list(executor.map(connect, range(connections)))
 
     def _create_completion(
         self,
@@ -31,16 +103,68 @@ class OpenAIClient:
         response_format: Any = str,
     ) -> Any:
         """Helper method to create chat completions with common pattern."""
-        response = self.client.beta.chat.completions.parse(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_content},
-            ],
-            temperature=temperature,
-            response_format=response_format,
+        estimated_tokens = (
+            len(system_prompt) + len(user_content)
+        ) // CHARS_PER_TOKEN + COMPLETION_TOKEN_ALLOWANCE
+
+        return (
+            self._call_with_retries(
+                self.client.beta.chat.completions.with_raw_response.parse,
+                self.scheduler,
+                estimated_tokens,
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_content},
+                ],
+                temperature=temperature,
+                response_format=response_format,
+            )
+            .choices[0]
+            .message.parsed
         )
-        return response.choices[0].message.parsed
+
+    def _call_with_retries(
+        self,
+        create: Any,
+        scheduler: RateLimitScheduler,
+        estimated_tokens: int,
+        **kwargs: Any,
+    ) -> Any:
+        """Runs a raw-response API call under the scheduler, retrying on failure."""
+        attempt = 0
+        while True:
+            try:
+                with scheduler.slot(estimated_tokens):
+                    raw_response = create(**kwargs)
+            except RETRYABLE_ERRORS as e:
+                # An exhausted quota will not recover by waiting
+                if attempt >= self.max_retries or _is_quota_error(e):
+                    raise
+
+                retry_after = None
+                if isinstance(e, RateLimitError):
+                    retry_after = scheduler.record_rate_limited(e.response.headers)
+                time.sleep(scheduler.backoff(attempt, retry_after))
+                attempt += 1
+                continue
+
+            scheduler.update(raw_response.headers)
+            scheduler.record_success()
+            return raw_response.parse()
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embeds texts for semantic lookups, one vector per input text."""
+        # Keep inputs well inside the embedding model's context window
+        inputs = [text[:EMBEDDING_MAX_CHARS] for text in texts]
+        response = self._call_with_retries(
+            self.client.embeddings.with_raw_response.create,
+            self.embedding_scheduler,
+            sum(len(text) for text in inputs) // CHARS_PER_TOKEN,
+            model=self.embedding_model,
+            input=inputs,
+        )
+        return [item.embedding for item in response.data]
 
     def analyze_relevance(self, content: AnalyzedContent, question: str) -> bool:
         class RelevanceResponse(BaseModel):
@@ -69,50 +193,166 @@ class OpenAIClient:
         )
 
     def answer_question(
-        self, sources: List[AnalyzedContent], question: str
+        self, sources: Iterable[AnalyzedContent], question: str
     ) -> SearchResponse:
-        def format_source(source: AnalyzedContent) -> str:
-            parts = [
-                f"title: {source.title}",
-                f"url: {source.url}",
-            ]
-            if source.published:
-                parts.append(f"published: {source.published}")
-            parts.append(source.content)
+        """
+        Answers from all sources in a single prompt.
 
-            return "\n".join(parts)
-
-        class AnswerReference(BaseModel):
-            title: str = Field(description="Source title")
-            url: str = Field(description="Source URL")
+        References are taken from the sources themselves, the model only picks
+        which of them it used.
+        """
 
         class AnswerResponse(BaseModel):
             steps: List[Step] = Field(description="Chain of thoughts steps")
             answer: str = Field(description="Final answer to the question")
-            references: List[AnswerReference] = Field(
-                description="List of most relevant references used in the answer"
+            used_sources: List[int] = Field(
+                description="Numbers of the sources used in the answer"
             )
 
-        sources_text = "\n\n".join([format_source(a) for a in sources])
+        # Sources may be loaded lazily, so only one is materialized at a time
+        # and only its reference is kept
+        sources_text = io.StringIO()
+        references: List[Reference] = []
+        for source in sources:
+            if references:
+                sources_text.write("\n\n")
+            references.append(Reference(title=source.title, url=source.url))
+            sources_text.write(f"[{len(references)}]\n{format_source(source)}")
+
         response = self._create_completion(
             system_prompt=SYSTEM_PROMPT,
-            user_content=ANSWER_GENERATION_PROMPT.format(question, sources_text),
+            user_content=ANSWER_GENERATION_PROMPT.format(
+                question, sources_text.getvalue()
+            ),
             response_format=AnswerResponse,
         )
         return SearchResponse(
             question=question,
             answer=response.answer,
             references=[
-                Reference(title=r.title, url=r.url) for r in response.references
+                references[number - 1]
+                for number in dict.fromkeys(response.used_sources)
+                if 1 <= number <= len(references)
             ],
         )
 
-    def generate_search_queries(self, question: str) -> list[str]:
-        """Generate optimized search queries using OpenAI."""
+    def summarize_sources(
+        self, sources: Sequence[AnalyzedContent], question: str
+    ) -> PartialAnswer:
+        """
+        Answers from one group of sources, the map step of map-reduce synthesis.
+
+        References are taken from the sources themselves, the model only picks
+        which of them it used.
+        """
+
+        class SummaryResponse(BaseModel):
+            steps: List[Step] = Field(description="Chain of thoughts steps")
+            answer: str = Field(description="Answer based on these sources only")
+            used_sources: List[int] = Field(
+                description="Numbers of the sources used in the answer"
+            )
+
+        sources_text = "\n\n".join(
+            f"[{number}]\n{format_source(source)}"
+            for number, source in enumerate(sources, start=1)
+        )
+        response = self._create_completion(
+            system_prompt=SYSTEM_PROMPT,
+            user_content=SOURCE_SUMMARY_PROMPT.format(question, sources_text),
+            response_format=SummaryResponse,
+        )
+        return PartialAnswer(
+            answer=response.answer,
+            references=[
+                Reference(title=sources[number - 1].title, url=sources[number - 1].url)
+                for number in dict.fromkeys(response.used_sources)
+                if 1 <= number <= len(sources)
+            ],
+        )
+
+    def combine_answers(self, partials: Sequence[PartialAnswer], question: str) -> str:
+        """Combines partial answers into one, the reduce step of synthesis."""
+
+        class CombinedResponse(BaseModel):
+            steps: List[Step] = Field(description="Chain of thoughts steps")
+            answer: str = Field(description="Final answer to the question")
+
+        partials_text = "\n\n".join(
+            f"Partial answer {number}:\n{partial.answer}"
+            for number, partial in enumerate(partials, start=1)
+        )
+        response = self._create_completion(
+            system_prompt=SYSTEM_PROMPT,
+            user_content=COMBINE_ANSWERS_PROMPT.format(question, partials_text),
+            response_format=CombinedResponse,
+        )
+        return response.answer
+
+    def answer_from_snippets(
+        self, results: Iterable[SearchResult], question: str
+    ) -> Optional[SearchResponse]:
+        """
+        Answers from search snippets alone when they hold enough evidence.
+
+        References are taken from the search results themselves, the model
+        only picks which snippets it used.
+
+        Returns:
+            SearchResponse or None if the pages have to be read
+        """
+
+        class SnippetAnswerResponse(BaseModel):
+            steps: List[Step] = Field(description="Chain of thoughts steps")
+            is_sufficient: bool = Field(
+                description="Whether the snippets are enough to answer the question"
+            )
+            answer: str = Field(description="Answer to the question, if sufficient")
+            used_snippets: List[int] = Field(
+                description="Numbers of the snippets used in the answer"
+            )
+
+        results = list(results)
+        snippets_text = "\n\n".join(
+            f"[{number}]\ntitle: {r.title}\nurl: {r.url}\n{r.snippet}"
+            for number, r in enumerate(results, start=1)
+        )
+        response = self._create_completion(
+            system_prompt=SYSTEM_PROMPT,
+            user_content=SNIPPET_ANSWER_PROMPT.format(question, snippets_text),
+            response_format=SnippetAnswerResponse,
+        )
+        if not response.is_sufficient or not response.answer:
+            return None
+
+        return SearchResponse(
+            question=question,
+            answer=response.answer,
+            references=[
+                Reference(title=results[number - 1].title, url=results[number - 1].url)
+                for number in dict.fromkeys(response.used_snippets)
+                if 1 <= number <= len(results)
+            ],
+        )
+
+    def generate_search_queries(self, question: str) -> List[PlannedQuery]:
+        """
+        Plans the search queries for a question using OpenAI.
+
+        Returns:
+            Queries ordered by priority, most important first
+        """
 
         # Define Pydantic Data Model
+        class SearchQuery(BaseModel):
+            query: str = Field(description="Search query")
+            priority: int = Field(description="1 (essential) to 3 (nice to have)")
+            expected_results: int = Field(
+                description="Number of search results worth reading, 1-10"
+            )
+
         class SearchQueries(BaseModel):
-            queries: List[str] = Field(description="List of search queries")
+            queries: List[SearchQuery] = Field(description="List of search queries")
 
         class SearchQueryResponse(BaseModel):
             steps: List[Step] = Field(description="Chain of thoughts steps")
@@ -125,4 +365,28 @@ class OpenAIClient:
             user_content=QUERY_GENERATION_PROMPT.format(question),
             response_format=SearchQueryResponse,
         )
-        return response.final_answer.queries
+        queries = [
+            PlannedQuery(
+                query=q.query,
+                priority=min(max(q.priority, 1), 3),
+                expected_results=min(max(q.expected_results, 1), 10),
+            )
+            for q in response.final_answer.queries
+        ]
+        return sorted(queries, key=lambda q: q.priority)
+
+
+def format_source(source: AnalyzedContent) -> str:
+    parts = [
+        f"title: {source.title}",
+        f"url: {source.url}",
+    ]
+    if source.published:
+        parts.append(f"published: {source.published}")
+    parts.append(source.content)
+
+    return "\n".join(parts)
+
+
+def _is_quota_error(error: Exception) -> bool:
+    return getattr(error, "code", None) == "insufficient_quota"
@@ -0,0 +1,118 @@
+import os
+import shutil
+import tempfile
+import threading
+from collections.abc import Sequence
+from typing import Dict, Iterator, List, Optional
+
+from askweb.models import AnalyzedContent, PageRecord
+
+DEFAULT_MEMORY_LIMIT = 64 * 1024 * 1024
+
+
+class PageStore:
+    """
+    Holds page bodies for a run within a fixed memory budget.
+
+    Bodies are kept in memory until ``memory_limit`` bytes are used; anything
+    beyond that is spilled to a temporary directory and read back on demand.
+    The directory is removed when the store is closed.
+
+    The pipeline stores the relevant passages used for the answer, not the full
+    pages, which live only in the worker that extracts and analyzes them.
+    """
+
+    def __init__(self, memory_limit: int = DEFAULT_MEMORY_LIMIT):
+        self.memory_limit = memory_limit
+        self.memory_used = 0
+        self.spilled = 0
+        self._memory: Dict[str, str] = {}
+        self._spill_dir: Optional[str] = None
+        self._next_key = 0
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "PageStore":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def put(self, body: str) -> str:
+        """Stores a body and returns the key to load it with."""
+        size = len(body.encode("utf-8"))
+        with self._lock:
+            key = str(self._next_key)
+            self._next_key += 1
+            if self.memory_used + size <= self.memory_limit:
+                self._memory[key] = body
+                self.memory_used += size
+                return key
+            if self._spill_dir is None:
+                self._spill_dir = tempfile.mkdtemp(prefix="askweb-pages-")
+            self.spilled += 1
+
+        with open(self._path(key), "w", encoding="utf-8") as f:
+            f.write(body)
+        return key
+
+    def get(self, key: str) -> str:
+        with self._lock:
+            body = self._memory.get(key)
+        if body is not None:
+            return body
+        with open(self._path(key), encoding="utf-8") as f:
+            return f.read()
+
+    def add(self, content: AnalyzedContent) -> PageRecord:
+        """Moves the content body into the store and returns a compact record."""
+        return PageRecord(
+            title=content.title,
+            url=str(content.url),
+            published=content.published,
+            is_relevant=content.is_relevant,
+            body_key=self.put(content.content) if content.content else None,
+        )
+
+    def load(self, record: PageRecord) -> AnalyzedContent:
+        return AnalyzedContent(
+            title=record.title,
+            url=record.url,
+            published=record.published,
+            is_relevant=record.is_relevant,
+            content=self.get(record.body_key) if record.body_key else None,
+        )
+
+    def contents(self, records: List[PageRecord]) -> "StoredContents":
+        return StoredContents(self, records)
+
+    def close(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self.memory_used = 0
+            if self._spill_dir:
+                shutil.rmtree(self._spill_dir, ignore_errors=True)
+                self._spill_dir = None
+
+    def _path(self, key: str) -> str:
+        assert self._spill_dir is not None
+        return os.path.join(self._spill_dir, f"{key}.md")
+
+
+class StoredContents(Sequence):
+    """Read-only sequence of ``AnalyzedContent`` loaded lazily from a store."""
+
+    def __init__(self, store: PageStore, records: List[PageRecord]):
+        self.store = store
+        self.records = records
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __iter__(self) -> Iterator[AnalyzedContent]:
+        for record in self.records:
+            yield self.store.load(record)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.store.load(record) for record in self.records[index]]
+        return self.store.load(self.records[index])
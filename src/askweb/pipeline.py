@@ -0,0 +1,542 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from askweb.analysis import ContentAnalyzer
+from askweb.cache import (
+    CACHE_MAX_AGE_DAYS,
+    CACHE_THRESHOLD,
+    DEFAULT_MODE,
+    QuestionCache,
+)
+from askweb.content import (
+    BLOCK_HOURS,
+    DEFAULT_MAX_BYTES,
+    ContentExtractor,
+    DomainBlocklist,
+)
+from askweb.fetch import FetchScheduler
+from askweb.index import (
+    MAX_AGE_DAYS,
+    MIN_LOCAL_SOURCES,
+    MIN_SIMILARITY,
+    ContentIndex,
+)
+from askweb.journal import RunJournal
+from askweb.metrics import RunMetrics
+from askweb.models import (
+    AnalyzedContent,
+    PageRecord,
+    PipelineEvent,
+    PipelineResult,
+    SearchResponse,
+    SearchResult,
+)
+from askweb.openai_client import OpenAIClient
+from askweb.pagestore import DEFAULT_MEMORY_LIMIT, PageStore
+from askweb.profiling import stage
+from askweb.search import WebSearcher
+from askweb.synthesis import DEFAULT_GROUP_TOKENS
+
+EMBEDDING_BATCH_SIZE = 16
+# Unique search results fetched per question, shared by all queries
+DEFAULT_FETCH_BUDGET = 15
+WARM_UP_CONNECTIONS = 4
+
+EventHandler = Callable[[PipelineEvent], None]
+
+
+@dataclass
+class PipelineOptions:
+    """Settings of a pipeline run; sizes are in bytes and ages in days."""
+
+    # Cap on the results of one query, the plan asks for 1-10 each
+    max_results: int = 10
+    max_fetches: int = DEFAULT_FETCH_BUDGET
+    workers: int = 8
+    local_first: bool = False
+    max_age: float = MAX_AGE_DAYS
+    local_threshold: float = MIN_SIMILARITY
+    local_min_sources: int = MIN_LOCAL_SOURCES
+    refresh: bool = False
+    cache_threshold: float = CACHE_THRESHOLD
+    cache_max_age: float = CACHE_MAX_AGE_DAYS
+    memory_limit: int = DEFAULT_MEMORY_LIMIT
+    max_page_size: int = DEFAULT_MAX_BYTES
+    block_hours: float = BLOCK_HOURS
+    pdf: bool = False
+    max_sources: Optional[int] = None
+    per_host: int = 2
+    fast: bool = False
+    resume: bool = False
+    warm_up: bool = False
+    synthesis: str = "auto"
+    group_tokens: int = DEFAULT_GROUP_TOKENS
+
+
+class Pipeline:
+    """
+    One run of the question answering pipeline.
+
+    Stages report progress as ``PipelineEvent`` objects, which are collected
+    in ``events`` and passed to ``on_event`` as they happen. Events are always
+    emitted from the thread that called ``run``.
+    """
+
+    def __init__(
+        self,
+        question: str,
+        openai_client: OpenAIClient,
+        options: Optional[PipelineOptions] = None,
+        on_event: Optional[EventHandler] = None,
+        searcher: Optional[WebSearcher] = None,
+    ):
+        self.question = question
+        self.options = options or PipelineOptions()
+        self.on_event = on_event
+        self.events: List[PipelineEvent] = []
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+
+        self.openai_client = openai_client
+        self.metrics = RunMetrics()
+        # A searcher passed in is shared, one created here is closed after run
+        self._owns_searcher = searcher is None
+        self._warm_ups: List[threading.Thread] = []
+        self.searcher = searcher or WebSearcher(max_results=self.options.max_results)
+        self.fetch_scheduler = FetchScheduler(per_host=self.options.per_host)
+        self.extractor = ContentExtractor(
+            max_bytes=self.options.max_page_size,
+            blocklist=DomainBlocklist(block_hours=self.options.block_hours),
+            metrics=self.metrics,
+            pdf=self.options.pdf,
+            scheduler=self.fetch_scheduler,
+        )
+        self.analyzer = ContentAnalyzer(
+            openai_client,
+            synthesis=self.options.synthesis,
+            group_tokens=self.options.group_tokens,
+            workers=self.options.workers,
+        )
+        self.index = ContentIndex()
+        self.cache = QuestionCache(
+            threshold=self.options.cache_threshold,
+            max_age_days=self.options.cache_max_age,
+        )
+        self.journal = RunJournal(question, resume=self.options.resume)
+
+    def emit(self, stage: str, kind: str, message: str = "", **data: Any) -> None:
+        event = PipelineEvent(
+            stage=stage,
+            kind=kind,
+            message=message,
+            data=data,
+            elapsed=round(time.monotonic() - self._started, 3),
+        )
+        with self._lock:
+            self.events.append(event)
+        if self.on_event:
+            self.on_event(event)
+
+    def run(self) -> PipelineResult:
+        try:
+            response = self._answer()
+            # Finished runs need no journal; failed ones keep it for --resume
+            self.journal.complete()
+        finally:
+            self.journal.close()
+            self.index.close()
+            self.cache.close()
+            # Warm-up requests are bounded by their own timeouts
+            for thread in self._warm_ups:
+                thread.join()
+            if self._owns_searcher:
+                self.searcher.close()
+
+        if response:
+            self.emit("answer", "result", response=response.model_dump(mode="json"))
+        self._report_metrics()
+
+        return PipelineResult(
+            question=self.question,
+            response=response,
+            events=self.events,
+            metrics=self.metrics.as_dict(),
+        )
+
+    def _answer(self) -> Optional[SearchResponse]:
+        if not self.journal.is_empty:
+            self.emit(
+                "journal",
+                "info",
+                f"Resuming: {len(self.journal.search_results)} searches and "
+                f"{len(self.journal.pages)} analyzed pages done",
+                searches=len(self.journal.search_results),
+                pages=len(self.journal.pages),
+            )
+
+        question_embedding = self.embed_question()
+
+        if question_embedding is not None and not self.options.refresh:
+            cached_response = self.find_cached_answer(question_embedding)
+            if cached_response:
+                return cached_response
+
+        # Relevant passages stay within the memory limit, the rest is spilled
+        with PageStore(memory_limit=self.options.memory_limit) as store:
+            response = None
+            relevant_contents: Sequence[AnalyzedContent] = []
+            if self.options.local_first and question_embedding is not None:
+                relevant_contents = self.find_local_sources(question_embedding)
+
+            if not relevant_contents:
+                with stage("search"):
+                    results = self.search_web()
+                if self.options.fast:
+                    with stage("answer"):
+                        response = self.answer_from_snippets(results)
+                if response is None:
+                    with stage("analysis"):
+                        relevant_contents = self.analyze_results(results, store)
+                    self.fetch_scheduler.save()
+                    self.index_sources(relevant_contents)
+
+            if response is None:
+                if not relevant_contents:
+                    self.emit("answer", "info", "No relevant answers found.")
+                    return None
+
+                self.emit(
+                    "answer",
+                    "info",
+                    f"Found {len(relevant_contents)} relevant sources.",
+                    sources=len(relevant_contents),
+                )
+                self.emit("answer", "start")
+                with stage("answer"):
+                    response = self.analyzer.create_search_response(
+                        relevant_contents, self.question
+                    )
+                self.emit("answer", "end")
+
+        if question_embedding is not None:
+            try:
+                self.cache.store(question_embedding, response, self.answer_mode)
+            except Exception as e:
+                self.emit("cache", "warning", f"Failed to cache the answer: {str(e)}")
+
+        return response
+
+    @property
+    def answer_mode(self) -> str:
+        """How this run answers, answers cached in another mode are not reused."""
+        modes = [
+            name
+            for name, enabled in (
+                ("local", self.options.local_first),
+                ("fast", self.options.fast),
+            )
+            if enabled
+        ]
+        return "+".join(modes) or DEFAULT_MODE
+
+    def embed_question(self) -> Optional[List[float]]:
+        try:
+            return self.openai_client.embed([self.question])[0]
+        except Exception as e:
+            self.emit("cache", "warning", f"Failed to embed the question: {str(e)}")
+            return None
+
+    def find_cached_answer(
+        self, question_embedding: List[float]
+    ) -> Optional[SearchResponse]:
+        try:
+            hit = self.cache.lookup(question_embedding, self.answer_mode)
+            hits, misses = self.cache.stats()
+        except Exception as e:
+            self.emit("cache", "warning", f"Question cache lookup failed: {str(e)}")
+            return None
+
+        lookups = hits + misses
+        self.emit(
+            "cache",
+            "info",
+            f"Question cache {'hit' if hit else 'miss'}, hit rate "
+            f"{hits / max(1, lookups):.0%} ({hits}/{lookups})",
+            hit=hit is not None,
+            hits=hits,
+            lookups=lookups,
+        )
+        if hit:
+            self.emit(
+                "cache",
+                "info",
+                f"Answering from cache, similar question: "
+                f"'{hit.response.question}' ({hit.similarity:.2f})",
+                question=hit.response.question,
+                similarity=hit.similarity,
+            )
+            # The heading shows the question asked now, not the cached one
+            return hit.response.model_copy(update={"question": self.question})
+        return None
+
+    def find_local_sources(
+        self, question_embedding: List[float]
+    ) -> List[AnalyzedContent]:
+        """Returns indexed passages that can answer without a web search."""
+        try:
+            matches = self.index.search(
+                question_embedding,
+                min_similarity=self.options.local_threshold,
+                max_age_days=self.options.max_age,
+            )
+        except Exception as e:
+            self.emit("local", "warning", f"Local index lookup failed: {str(e)}")
+            return []
+
+        if len(matches) < self.options.local_min_sources:
+            self.emit(
+                "local",
+                "info",
+                f"Local index has {len(matches)} matching sources, searching the web",
+                matches=len(matches),
+            )
+            return []
+
+        for match in matches:
+            self.emit(
+                "local",
+                "info",
+                f"* {match.content.title} ({match.similarity:.2f})",
+                url=str(match.content.url),
+                title=match.content.title,
+                similarity=match.similarity,
+            )
+        return [match.content for match in matches]
+
+    def index_sources(self, sources: Sequence[AnalyzedContent]) -> None:
+        """Persists relevant passages so later questions can reuse them."""
+        try:
+            # Batches keep only a few passages loaded from the page store at once
+            for start in range(0, len(sources), EMBEDDING_BATCH_SIZE):
+                batch = list(sources[start : start + EMBEDDING_BATCH_SIZE])
+                embeddings = self.openai_client.embed(
+                    [f"{source.title}\n{source.content}" for source in batch]
+                )
+                self.index.add_many(batch, embeddings)
+        except Exception as e:
+            self.emit("index", "warning", f"Failed to update local index: {str(e)}")
+
+    def search_web(self) -> List[SearchResult]:
+        """
+        Plans search queries for the question and collects their results.
+
+        Queries run by priority, each asking for as many results as the plan
+        expects, and stop once ``max_fetches`` unique results are found, so
+        lower-priority queries are skipped when the important ones suffice.
+
+        Returns:
+            Unique results by query priority, then in search engine order
+        """
+        self.emit("queries", "start")
+        plan = self.journal.queries
+        if plan is None:
+            if self.options.warm_up:
+                self._warm_up()
+            plan = self.openai_client.generate_search_queries(self.question)
+            self.journal.record_queries(plan)
+        self.emit(
+            "queries",
+            "end",
+            queries=[planned.query for planned in plan],
+            plan=[planned.model_dump() for planned in plan],
+        )
+
+        budget = self.options.max_fetches
+        # Ordered, so the budget keeps the results of the most important queries
+        found: Dict[SearchResult, None] = {}
+        self.emit("search", "start", total=len(plan))
+        for planned in sorted(plan, key=lambda planned: planned.priority):
+            query = planned.query
+            if len(found) >= budget:
+                self.emit(
+                    "search",
+                    "progress",
+                    f"Query: '{query}' skipped, {len(found)} results already",
+                    query=query,
+                    skipped=True,
+                )
+                continue
+
+            results = self.journal.search_results.get(query)
+            if results is None:
+                results = self.searcher.search(
+                    query,
+                    max_results=min(planned.expected_results, self.options.max_results),
+                )
+                self.journal.record_search(query, results)
+            found.update(dict.fromkeys(results))
+            self.emit(
+                "search",
+                "progress",
+                f"Query: '{query}' returned {len(results)} results",
+                query=query,
+                results=len(results),
+            )
+
+        all_results = list(found)[:budget]
+        self.emit("search", "end", results=len(all_results))
+
+        return all_results
+
+    def _warm_up(self) -> None:
+        """Opens connections for the later stages while queries are generated."""
+        # One OpenAI connection per worker that will analyze pages in parallel
+        connections = min(self.options.workers, WARM_UP_CONNECTIONS)
+        for target, args in [
+            (self.searcher.warm_up, ()),
+            (self.openai_client.warm_up, (connections,)),
+        ]:
+            thread = threading.Thread(target=target, args=args, daemon=True)
+            thread.start()
+            self._warm_ups.append(thread)
+
+    def answer_from_snippets(
+        self, results: List[SearchResult]
+    ) -> Optional[SearchResponse]:
+        if not results:
+            return None
+
+        self.emit("snippets", "start")
+        try:
+            # In search order, so the most important results are numbered first
+            response = self.openai_client.answer_from_snippets(results, self.question)
+        except Exception as e:
+            self.emit("snippets", "warning", f"Snippet answer failed: {str(e)}")
+            response = None
+        self.emit("snippets", "end", sufficient=response is not None)
+
+        if response is None:
+            self.emit("snippets", "info", "Snippets are not enough, reading the pages")
+        return response
+
+    def analyze_results(
+        self, all_results: List[SearchResult], store: PageStore
+    ) -> Sequence[AnalyzedContent]:
+        """
+        Extracts the found pages and returns their content relevant to the question.
+
+        Full pages never leave the worker that analyzed them; the returned
+        sequence loads the relevant passages from the page store on access.
+        """
+
+        def extract_and_analyze(result: SearchResult) -> Optional[PageRecord]:
+            candidate = self.journal.pages.get(str(result.url))
+            if candidate is None:
+                with stage("extraction"):
+                    content = self.extractor.extract(result)
+                if not content:
+                    return None
+                with stage("analysis"):
+                    candidate = self.analyzer.analyze_content(content, self.question)
+                if not candidate:
+                    return None
+                self.journal.record_page(candidate)
+            # Only the relevant passage is kept, and it goes to the page store
+            if not candidate.is_relevant:
+                candidate.content = None
+            return store.add(candidate)
+
+        # Extract and analyze content; OpenAI calls are throttled by the client
+        self.emit("analysis", "start", total=len(all_results))
+        relevant_records = []
+        max_sources = self.options.max_sources
+        with ThreadPoolExecutor(max_workers=max(1, self.options.workers)) as executor:
+            # Likely-fast hosts first, spread so workers don't queue on one host
+            futures = [
+                executor.submit(extract_and_analyze, result)
+                for result in self.fetch_scheduler.order(all_results)
+            ]
+            for future in as_completed(futures):
+                record = future.result()
+                if record and record.is_relevant:
+                    relevant_records.append(record)
+                if record:
+                    self.emit(
+                        "analysis",
+                        "progress",
+                        f"{'+' if record.is_relevant else '-'} {record.title}",
+                        url=record.url,
+                        title=record.title,
+                        relevant=record.is_relevant,
+                    )
+                else:
+                    self.emit("analysis", "progress")
+
+                if max_sources and len(relevant_records) >= max_sources:
+                    skipped = sum(f.cancel() for f in futures)
+                    self.emit(
+                        "analysis",
+                        "info",
+                        f"Found {len(relevant_records)} sources, "
+                        f"skipped {skipped} remaining pages",
+                        skipped=skipped,
+                    )
+                    break
+        self.emit("analysis", "end", relevant=len(relevant_records))
+
+        return store.contents(relevant_records)
+
+    def _report_metrics(self) -> None:
+        rejected = self.metrics.with_prefix("rejected")
+        if rejected:
+            details = ", ".join(
+                f"{reason.replace('_', ' ')}: {count}"
+                for reason, count in rejected.items()
+            )
+            self.emit(
+                "metrics",
+                "info",
+                f"Rejected {sum(rejected.values())} URLs before extraction ({details})",
+                rejected=rejected,
+            )
+
+
+def ask(
+    question: str,
+    options: Optional[PipelineOptions] = None,
+    *,
+    api_key: Optional[str] = None,
+    openai_client: Optional[OpenAIClient] = None,
+    on_event: Optional[EventHandler] = None,
+    searcher: Optional[WebSearcher] = None,
+) -> PipelineResult:
+    """
+    Answers a question from web sources.
+
+    Args:
+        question: The question to answer
+        options: Pipeline settings, defaults to ``PipelineOptions()``
+        api_key: OpenAI API key, defaults to ``OPENAI_API_KEY``
+        openai_client: Client to reuse instead of creating one from the key
+        on_event: Called with every ``PipelineEvent`` as it happens
+        searcher: Search client to reuse across questions
+
+    Clients passed in are left open for the caller; the ones created here are
+    closed before returning.
+
+    Returns:
+        PipelineResult with the response, or None if no relevant sources were
+        found, and all events of the run
+    """
+    if openai_client is not None:
+        return Pipeline(question, openai_client, options, on_event, searcher).run()
+
+    api_key = api_key or os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise ValueError("OpenAI API key is required, set OPENAI_API_KEY")
+    with OpenAIClient(api_key) as openai_client:
+        return Pipeline(question, openai_client, options, on_event, searcher).run()
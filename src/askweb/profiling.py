@@ -0,0 +1,249 @@
+import cProfile
+import io
+import pstats
+import sys
+import threading
+import tracemalloc
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+PROFILE_MODES = ("cpu", "mem", "both")
+SAMPLE_INTERVAL = 0.005
+TOP_FUNCTIONS = 30
+TOP_ALLOCATIONS = 15
+TRACEBACK_DEPTH = 10
+# From 3.12 cProfile sees every thread, but only one can be enabled at a time
+PROFILE_ALL_THREADS = sys.version_info >= (3, 12)
+
+T = TypeVar("T")
+
+# Profiler of the current run; stages are no-ops while it is None
+_active: Optional["StageProfiler"] = None
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Attributes the work done by the calling thread to a pipeline stage."""
+    profiler = _active
+    if profiler is None:
+        yield
+        return
+    with profiler.stage(name):
+        yield
+
+
+def propagate(fn: Callable[..., T]) -> Callable[..., T]:
+    """
+    Runs ``fn`` in the caller's current stage, for work handed to a thread pool.
+
+    Threads of a pool do not inherit the stage of the thread that submitted
+    the work, so their time would not be attributed otherwise.
+    """
+    profiler = _active
+    name = profiler.current_stage() if profiler else None
+    if name is None:
+        return fn
+
+    def run(*args, **kwargs) -> T:
+        with profiler.stage(name):
+            return fn(*args, **kwargs)
+
+    return run
+
+
+class StageProfiler:
+    """
+    Profiles one run of the pipeline, stage by stage.
+
+    - ``cpu``: sampled call stacks of every thread working in a stage, in the
+      collapsed format read by flamegraph.pl and speedscope, summarized per
+      stage in ``<stage>.samples.txt``, and a cProfile per stage. Before
+      Python 3.12 the cProfile of a stage is merged over every thread that
+      worked in it. From 3.12 only one cProfile can run, so only stages
+      entered by the thread that started profiling get one, and it also holds
+      the stages its worker threads run meanwhile (extraction shows up in
+      ``analysis.pstats``); the sample summaries keep the stages apart
+    - ``mem``: tracemalloc peak and top allocation sites of each stage entered
+      by the thread that started profiling; allocations of the worker threads
+      count towards that stage
+
+    Reports are written to ``out_dir`` when the profiler exits.
+    """
+
+    def __init__(self, mode: str, out_dir: Path):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode: {mode}")
+        self.cpu = mode in ("cpu", "both")
+        self.mem = mode in ("mem", "both")
+        self.out_dir = Path(out_dir)
+
+        self._lock = threading.Lock()
+        self._stages: Dict[int, List[str]] = defaultdict(list)
+        self._stats: Dict[str, pstats.Stats] = {}
+        self._samples: Counter = Counter()
+        self._memory: List[Tuple[str, int, List[tracemalloc.StatisticDiff]]] = []
+        self._owner = threading.get_ident()
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+
+    def __enter__(self) -> "StageProfiler":
+        global _active
+        self._owner = threading.get_ident()
+        if self.mem:
+            tracemalloc.start(TRACEBACK_DEPTH)
+        if self.cpu:
+            self._sampler = threading.Thread(
+                target=self._sample, name="askweb-profiler", daemon=True
+            )
+            self._sampler.start()
+        _active = self
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        global _active
+        _active = None
+        if self._sampler:
+            self._stop.set()
+            self._sampler.join()
+        if self.mem:
+            tracemalloc.stop()
+        self.write_reports()
+
+    def current_stage(self) -> Optional[str]:
+        with self._lock:
+            stack = self._stages.get(threading.get_ident())
+            return stack[-1] if stack else None
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        thread = threading.get_ident()
+        with self._lock:
+            stack = self._stages[thread]
+            outermost = not stack
+            stack.append(name)
+
+        # A thread can only run one cProfile at a time, nested stages are
+        # counted towards the outer one
+        owner = thread == self._owner
+        profile = None
+        if self.cpu and outermost and (owner or not PROFILE_ALL_THREADS):
+            profile = cProfile.Profile()
+        if profile:
+            try:
+                profile.enable()
+            except ValueError:  # another profiler is already active
+                profile = None
+
+        track_memory = self.mem and outermost and owner
+        if track_memory:
+            tracemalloc.reset_peak()
+            before = tracemalloc.take_snapshot()
+        try:
+            yield
+        finally:
+            if profile:
+                profile.disable()
+                self._add_stats(name, profile)
+            if track_memory:
+                _, peak = tracemalloc.get_traced_memory()
+                after = tracemalloc.take_snapshot()
+                top = after.compare_to(before, "lineno")[:TOP_ALLOCATIONS]
+                with self._lock:
+                    self._memory.append((name, peak, top))
+            with self._lock:
+                stack.pop()
+                if not stack:
+                    del self._stages[thread]
+
+    def write_reports(self) -> List[Path]:
+        """Writes the collected profiles, returns the paths of the files."""
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        written = []
+
+        for name, stats in self._stats.items():
+            stats_path = self.out_dir / f"{name}.pstats"
+            stats.dump_stats(stats_path)
+            text = io.StringIO()
+            stats.stream = text
+            stats.sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+            text_path = self.out_dir / f"{name}.txt"
+            text_path.write_text(text.getvalue())
+            written += [stats_path, text_path]
+
+        if self._samples:
+            collapsed_path = self.out_dir / "stacks.collapsed"
+            collapsed_path.write_text(
+                "".join(f"{stack} {count}\n" for stack, count in self._samples.items())
+            )
+            written.append(collapsed_path)
+            for name, summary in self._sample_summaries().items():
+                summary_path = self.out_dir / f"{name}.samples.txt"
+                summary_path.write_text(summary)
+                written.append(summary_path)
+
+        if self._memory:
+            memory_path = self.out_dir / "memory.txt"
+            with open(memory_path, "w") as f:
+                for name, peak, top in self._memory:
+                    f.write(f"== {name}: peak {peak / 1024 / 1024:.1f} MB\n")
+                    for statistic in top:
+                        f.write(f"{statistic}\n")
+                    f.write("\n")
+            written.append(memory_path)
+
+        return written
+
+    def _add_stats(self, name: str, profile: cProfile.Profile) -> None:
+        with self._lock:
+            if name in self._stats:
+                self._stats[name].add(profile)
+            else:
+                self._stats[name] = pstats.Stats(profile)
+
+    def _sample_summaries(self) -> Dict[str, str]:
+        """Top functions of each stage by samples spent in and under them."""
+        totals: Counter = Counter()
+        inclusive: Dict[str, Counter] = defaultdict(Counter)
+        own: Dict[str, Counter] = defaultdict(Counter)
+        for stack, count in self._samples.items():
+            name, *calls = stack.split(";")
+            totals[name] += count
+            for call in set(calls):
+                inclusive[name][call] += count
+            if calls:
+                own[name][calls[-1]] += count
+
+        summaries = {}
+        for name, total in totals.items():
+            lines = [
+                f"{total} samples every {SAMPLE_INTERVAL * 1000:g} ms",
+                "",
+                f"{'total':>7} {'self':>7}  function",
+            ]
+            for call, count in inclusive[name].most_common(TOP_FUNCTIONS):
+                lines.append(f"{count:>7} {own[name][call]:>7}  {call}")
+            summaries[name] = "\n".join(lines) + "\n"
+        return summaries
+
+    def _sample(self) -> None:
+        """Samples the stacks of all threads working in a stage."""
+        while not self._stop.wait(SAMPLE_INTERVAL):
+            with self._lock:
+                stages = {thread: stack[-1] for thread, stack in self._stages.items()}
+            frames = sys._current_frames()
+            for thread, name in stages.items():
+                frame = frames.get(thread)
+                if frame is None:
+                    continue
+                calls = []
+                while frame is not None:
+                    code = frame.f_code
+                    calls.append(
+                        f"{code.co_name} ({Path(code.co_filename).name}"
+                        f":{code.co_firstlineno})"
+                    )
+                    frame = frame.f_back
+                stack = ";".join([name, *reversed(calls)])
+                self._samples[stack] += 1
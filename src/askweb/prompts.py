@@ -22,13 +22,22 @@ SYSTEM_PROMPT = dedent(f"""
 
 # Query generation prompt
 QUERY_GENERATION_PROMPT = dedent("""
-    Generate 1-3 optimal search queries for the given question.
-    Return only the queries, one per line.
-    
+    Plan the web searches needed to answer the given question.
+
+    Scale the plan to the question: a simple factual question needs a single
+    query, a broad or multi-part question may need up to 5.
+
     The queries should:
     - Be specific and focused
     - Provide enough information to compile the answer
     - Be formatted for web search
+    - Not overlap; each query should find something the others do not
+
+    For each query give:
+    - priority: 1 for queries the answer depends on, 2 for useful context,
+      3 for nice-to-have details
+    - expected_results: how many search results (1-10) are worth reading
+      for this query
                                  
     Question: {}                            
     """).strip()
@@ -65,9 +74,70 @@ ANSWER_GENERATION_PROMPT = dedent("""
     - Use slightly informal tone, don't be stuffy
     - Don't use "In conclusion" or other introductory phrases
     - Don't add any suggested actions or recommendations
+    - List the numbers of the sources you used
                                    
     Question: {}
     
     Sources:
     {}
     """).strip()
+
+SOURCE_SUMMARY_PROMPT = dedent("""
+    Answer the question using only the numbered sources below. They are one
+    part of a larger set of sources; the partial answers of all parts will be
+    combined later.
+
+    Your answer should:
+    - Keep every fact, number and date that helps answer the question
+    - Be factual and based only on the provided sources
+    - Note any contradictions or differences between the sources
+    - Say so briefly if the sources do not answer the question
+    - List the numbers of the sources you used
+
+    Question: {}
+
+    Sources:
+    {}
+    """).strip()
+
+COMBINE_ANSWERS_PROMPT = dedent("""
+    Combine the partial answers below into one answer to the question. Each
+    partial answer was written from a different group of sources.
+
+    Your answer should:
+    - Synthesize information from all partial answers
+    - Be factual and based only on the partial answers
+    - Most recent information should be prioritized
+    - Note any contradictions or differences
+    - Use simple sentences and avoid complex structures, bullet points, etc.
+    - Use slightly informal tone, don't be stuffy
+    - Don't use "In conclusion" or other introductory phrases
+    - Don't add any suggested actions or recommendations
+
+    Question: {}
+
+    Partial answers:
+    {}
+    """).strip()
+
+SNIPPET_ANSWER_PROMPT = dedent("""
+    Decide whether the numbered search result snippets below contain enough
+    evidence to answer the question, and answer it if they do.
+
+    The snippets are sufficient only if they:
+    - Directly state the facts the answer needs
+    - Come from credible sources
+    - Are current enough for the question
+
+    If they are not sufficient, say so and leave the answer empty. Do not fill
+    gaps with your own knowledge.
+
+    When answering, follow the same rules as for a full answer: be factual,
+    use simple sentences, a slightly informal tone, and no introductory phrases.
+    List the numbers of the snippets you used.
+
+    Question: {}
+
+    Snippets:
+    {}
+    """).strip()
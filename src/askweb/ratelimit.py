@@ -0,0 +1,196 @@
+import email.utils
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Mapping, Optional
+
+# OpenAI reports reset windows as Go-style durations, e.g. "1s", "6m0s", "20ms"
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_UNIT_SECONDS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_reset_duration(value: Optional[str]) -> Optional[float]:
+    """Converts an OpenAI rate limit reset duration into seconds."""
+    if not value:
+        return None
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _UNIT_SECONDS[unit] for amount, unit in parts)
+
+
+def parse_retry_after(headers: Optional[Mapping[str, str]]) -> Optional[float]:
+    """Returns the server requested retry delay in seconds, if any."""
+    if not headers:
+        return None
+
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return float(retry_after)
+    except ValueError:
+        retry_date = email.utils.parsedate_tz(retry_after)
+        if retry_date is None:
+            return None
+        return max(0.0, email.utils.mktime_tz(retry_date) - time.time())
+
+
+def _parse_int(value: Optional[str]) -> Optional[int]:
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class RateLimitScheduler:
+    """
+    Thread-safe admission control for OpenAI requests.
+
+    Tracks the requests-per-minute and tokens-per-minute budgets reported in the
+    ``x-ratelimit-*`` response headers and holds new requests back until the
+    budget resets. Concurrency follows AIMD: it grows by roughly one slot per
+    window of successful calls and is halved on every rate limit response.
+    """
+
+    def __init__(
+        self,
+        initial_concurrency: int = 4,
+        min_concurrency: int = 1,
+        max_concurrency: int = 16,
+        decrease_factor: float = 0.5,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+    ):
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.decrease_factor = decrease_factor
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self.concurrency = float(initial_concurrency)
+        self.in_flight = 0
+        self.remaining_requests: Optional[int] = None
+        self.remaining_tokens: Optional[int] = None
+        self.requests_reset_at = 0.0
+        self.tokens_reset_at = 0.0
+        self.paused_until = 0.0
+
+        self._condition = threading.Condition()
+
+    @contextmanager
+    def slot(self, estimated_tokens: int = 0) -> Iterator[None]:
+        """Holds a request slot for the duration of the block."""
+        self.acquire(estimated_tokens)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def acquire(self, estimated_tokens: int = 0) -> None:
+        with self._condition:
+            while True:
+                wait = self._budget_wait(estimated_tokens)
+                if wait <= 0 and self.in_flight < int(self.concurrency):
+                    break
+                # Without a budget wait we are only waiting for a free slot,
+                # which release() will signal
+                self._condition.wait(timeout=wait if wait > 0 else None)
+
+            self.in_flight += 1
+            # Spend the budget locally until the next response refreshes it
+            if self.remaining_requests is not None:
+                self.remaining_requests -= 1
+            if self.remaining_tokens is not None:
+                self.remaining_tokens -= estimated_tokens
+
+    def release(self) -> None:
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def update(self, headers: Optional[Mapping[str, str]]) -> None:
+        """Refreshes the request and token budgets from response headers."""
+        if not headers:
+            return
+
+        now = time.monotonic()
+        with self._condition:
+            remaining_requests = _parse_int(
+                headers.get("x-ratelimit-remaining-requests")
+            )
+            if remaining_requests is not None:
+                self.remaining_requests = remaining_requests
+                reset = parse_reset_duration(headers.get("x-ratelimit-reset-requests"))
+                self.requests_reset_at = now + (reset or 0.0)
+
+            remaining_tokens = _parse_int(headers.get("x-ratelimit-remaining-tokens"))
+            if remaining_tokens is not None:
+                self.remaining_tokens = remaining_tokens
+                reset = parse_reset_duration(headers.get("x-ratelimit-reset-tokens"))
+                self.tokens_reset_at = now + (reset or 0.0)
+
+            self._condition.notify_all()
+
+    def record_success(self) -> None:
+        """Additive increase: about one extra slot per window of successes."""
+        with self._condition:
+            self.concurrency = min(
+                float(self.max_concurrency), self.concurrency + 1 / self.concurrency
+            )
+            self._condition.notify_all()
+
+    def record_rate_limited(
+        self, headers: Optional[Mapping[str, str]] = None
+    ) -> Optional[float]:
+        """
+        Multiplicative decrease after a 429 response.
+
+        Args:
+            headers: Headers of the rejected response
+
+        Returns:
+            Retry delay requested by the server in seconds, if any
+        """
+        self.update(headers)
+        retry_after = parse_retry_after(headers)
+
+        with self._condition:
+            self.concurrency = max(
+                float(self.min_concurrency), self.concurrency * self.decrease_factor
+            )
+            if retry_after:
+                self.paused_until = max(
+                    self.paused_until, time.monotonic() + retry_after
+                )
+            self._condition.notify_all()
+
+        return retry_after
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Full-jitter exponential backoff that never undercuts ``retry-after``."""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+        if retry_after is not None:
+            delay = max(delay, retry_after + random.uniform(0, self.base_delay))
+        return delay
+
+    def _budget_wait(self, estimated_tokens: int) -> float:
+        now = time.monotonic()
+        waits = [self.paused_until - now]
+        if self.remaining_requests is not None and self.remaining_requests <= 0:
+            waits.append(self.requests_reset_at - now)
+        if (
+            self.remaining_tokens is not None
+            and self.remaining_tokens < estimated_tokens
+        ):
+            waits.append(self.tokens_reset_at - now)
+        return max(waits)
@@ -1,26 +1,104 @@
+import math
 import random
+import threading
 import time
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+from urllib.parse import urlparse
 
 from ddgs import DDGS
 from rich.console import Console
 
 from askweb.models import SearchResult
 
+WARM_UP_TIMEOUT = 5
+SEARCH_REGION = "us-en"
+
 
 class WebSearcher:
+    """
+    Web search through DDGS, reusing one client for all queries.
+
+    The client keeps its search engines and their connections between queries
+    and retries; ``close`` drops them. Usable as a context manager.
+    """
+
     def __init__(self, max_results: int = 5):
         self.max_results = max_results
         self.console = Console(stderr=True)
+        self._next_search_at = 0.0
+        self._ddgs: Optional[DDGS] = None
+        self._ddgs_lock = threading.Lock()
+
+    def __enter__(self) -> "WebSearcher":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    @property
+    def ddgs(self) -> DDGS:
+        # The warm-up thread and the first search may both get here first
+        with self._ddgs_lock:
+            if self._ddgs is None:
+                self._ddgs = DDGS()
+            return self._ddgs
+
+    def close(self) -> None:
+        # DDGS has no close of its own, connections go with its engines
+        with self._ddgs_lock:
+            self._ddgs = None
 
-    def search(self, query: str, max_retries: int = 3) -> List[SearchResult]:
+    def warm_up(self) -> None:
+        """
+        Opens connections to the search engines every query starts with.
+
+        DDGS queries engines in batches of ``max_results / 10 + 1`` in priority
+        order. With the ``auto`` backend the first batch is always the same
+        (Wikipedia and Grokipedia), while the general engines after it are
+        shuffled per query, so only the first batch is worth connecting to.
+        """
+        try:
+            # DDGS has no public API for its engines; _get_engines creates and
+            # caches the instances, with their HTTP clients, that text() uses
+            engines = self.ddgs._get_engines("text", "auto")
+        except Exception:
+            return
+        engines = engines[: math.ceil(self.max_results / 10) + 1]
+        lang = SEARCH_REGION.split("-")[1]
+
+        def connect(engine) -> None:
+            parsed = urlparse(engine.search_url.replace("{lang}", lang))
+            try:
+                engine.http_client.request(
+                    "HEAD",
+                    f"{parsed.scheme}://{parsed.netloc}/",
+                    timeout=WARM_UP_TIMEOUT,
+                )
+            except Exception:
+                pass  # the search itself will retry
+
+        with ThreadPoolExecutor(max_workers=max(1, len(engines))) as executor:
+            list(executor.map(connect, engines))
+
+    def search(
+        self, query: str, max_results: Optional[int] = None, max_retries: int = 3
+    ) -> List[SearchResult]:
         results = []
         delay = 10  # delay in seconds for each retry
 
+        # keep a 5-10 second pause between searches, but don't wait after the last
+        wait = self._next_search_at - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+
         for attempt in range(max_retries):
             try:
-                search_results = DDGS().text(
-                    query, safesearch="off", max_results=self.max_results
+                search_results = self.ddgs.text(
+                    query,
+                    region=SEARCH_REGION,
+                    safesearch="off",
+                    max_results=max_results or self.max_results,
                 )
 
                 # If we got results, process them and break the retry loop
@@ -44,7 +122,6 @@ class WebSearcher:
             if attempt < max_retries - 1:
                 time.sleep(delay * (attempt + 1))
 
-        # pause for a 5-10 seconds before returning
-        time.sleep(random.randint(5, 10))
+        self._next_search_at = time.monotonic() + random.randint(5, 10)
 
         return results
@@ -0,0 +1,38 @@
+import math
+import os
+from array import array
+from pathlib import Path
+from typing import Sequence
+
+
+def default_cache_dir() -> Path:
+    """
+    Returns the directory for askweb's local state, creating it if needed.
+
+    ``ASKWEB_CACHE_DIR`` takes precedence, then ``$XDG_CACHE_HOME/askweb``,
+    then ``~/.cache/askweb``.
+    """
+    path = os.getenv("ASKWEB_CACHE_DIR")
+    if not path:
+        xdg_cache = os.getenv("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+        path = os.path.join(xdg_cache, "askweb")
+    cache_dir = Path(path)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    return cache_dir
+
+
+def pack_vector(vector: Sequence[float]) -> bytes:
+    """Serializes an embedding as float32 bytes for compact storage."""
+    return array("f", vector).tobytes()
+
+
+def unpack_vector(data: bytes) -> array:
+    vector = array("f")
+    vector.frombytes(data)
+    return vector
+
+
+def cosine_similarity(a: Sequence[float], b: Sequence[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b, strict=True))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
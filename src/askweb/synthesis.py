@@ -0,0 +1,100 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Sequence
+
+from askweb.models import AnalyzedContent, PartialAnswer, Reference, SearchResponse
+from askweb.openai_client import CHARS_PER_TOKEN, OpenAIClient, format_source
+from askweb.profiling import propagate
+
+# Prompt tokens of sources per map call; small enough to answer quickly
+DEFAULT_GROUP_TOKENS = 16_000
+SYNTHESIS_MODES = ("auto", "single", "map-reduce")
+
+
+def group_by_budget(sizes: Sequence[int], budget: int) -> List[List[int]]:
+    """
+    Packs items into consecutive groups whose total size stays within budget.
+
+    An item larger than the budget gets a group of its own.
+
+    Returns:
+        Groups of item indices, in order
+    """
+    groups: List[List[int]] = []
+    group_size = 0
+    for index, size in enumerate(sizes):
+        if not groups or group_size + size > budget:
+            groups.append([])
+            group_size = 0
+        groups[-1].append(index)
+        group_size += size
+    return groups
+
+
+def merge_references(partials: Sequence[PartialAnswer]) -> List[Reference]:
+    """Union of the partial answers' references in order, without duplicates."""
+    references = {}
+    for partial in partials:
+        for reference in partial.references:
+            references.setdefault(str(reference.url), reference)
+    return list(references.values())
+
+
+def synthesize_answer(
+    openai_client: OpenAIClient,
+    sources: Sequence[AnalyzedContent],
+    question: str,
+    mode: str = "auto",
+    group_tokens: int = DEFAULT_GROUP_TOKENS,
+    workers: int = 4,
+) -> SearchResponse:
+    """
+    Answers from the sources in a single prompt or by map-reduce.
+
+    Map-reduce answers groups of sources that fit ``group_tokens`` in
+    parallel, then combines the partial answers, in several levels if they do
+    not fit one prompt together, and in pairs if no more of them fit. ``auto``
+    uses it only when the sources do not fit a single group. On every path the
+    references are taken from the sources the answers used.
+    """
+    budget = group_tokens * CHARS_PER_TOKEN
+    # Sources may be loaded lazily, only their sizes are kept
+    groups = group_by_budget([len(format_source(s)) for s in sources], budget)
+    if mode == "single" or (mode == "auto" and len(groups) <= 1):
+        return openai_client.answer_question(sources, question)
+
+    def summarize(group: List[int]) -> PartialAnswer:
+        return openai_client.summarize_sources([sources[i] for i in group], question)
+
+    def combine(group: List[PartialAnswer]) -> PartialAnswer:
+        if len(group) == 1:
+            return group[0]
+        return PartialAnswer(
+            answer=openai_client.combine_answers(group, question),
+            references=merge_references(group),
+        )
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        partials = list(executor.map(propagate(summarize), groups))
+
+        # Reduce level by level until the partial answers fit one prompt
+        while len(partials) > 1:
+            groups = group_by_budget([len(p.answer) for p in partials], budget)
+            if len(groups) == 1:
+                break
+            if len(groups) == len(partials):
+                # No two partial answers fit together; pairs are the smallest
+                # prompts that still make progress
+                groups = [
+                    list(range(i, min(i + 2, len(partials))))
+                    for i in range(0, len(partials), 2)
+                ]
+            partials = list(
+                executor.map(
+                    propagate(combine), [[partials[i] for i in g] for g in groups]
+                )
+            )
+
+    final = combine(partials)
+    return SearchResponse(
+        question=question, answer=final.answer, references=final.references
+    )
@@ -4,6 +4,14 @@ import pytest
 from rich.console import Console
 
 
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    """Keeps local state written during tests out of the user's cache."""
+    path = tmp_path / "cache"
+    monkeypatch.setenv("ASKWEB_CACHE_DIR", str(path))
+    return path
+
+
 @pytest.fixture
 def mock_console():
     return MagicMock(spec=Console)
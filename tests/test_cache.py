@@ -0,0 +1,105 @@
+import sqlite3
+import time
+
+import pytest
+
+from askweb.cache import QuestionCache
+from askweb.models import Reference, SearchResponse
+from askweb.storage import pack_vector
+
+
+@pytest.fixture
+def question_cache(tmp_path):
+    cache = QuestionCache(path=tmp_path / "questions.sqlite", threshold=0.9)
+    yield cache
+    cache.close()
+
+
+@pytest.fixture
+def response():
+    return SearchResponse(
+        question="test question",
+        answer="Test answer",
+        references=[Reference(title="Test Title", url="https://example.com")],
+    )
+
+
+def test_lookup_hit(question_cache, response):
+    question_cache.store([1.0, 0.0], response)
+
+    hit = question_cache.lookup([0.99, 0.05])
+
+    assert hit is not None
+    assert hit.response == response
+    assert hit.similarity > 0.9
+
+
+def test_lookup_miss_below_threshold(question_cache, response):
+    question_cache.store([1.0, 0.0], response)
+
+    assert question_cache.lookup([0.5, 0.5]) is None
+
+
+def test_lookup_ignores_expired_answers(question_cache, response):
+    question_cache.store([1.0, 0.0], response)
+    question_cache.max_age_days = 1
+
+    future = time.time() + 2 * 86400
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr("askweb.cache.time.time", lambda: future)
+        assert question_cache.lookup([1.0, 0.0]) is None
+
+
+def test_lookup_returns_most_similar(question_cache, response):
+    other = response.model_copy(update={"answer": "Other answer"})
+    question_cache.store([1.0, 0.0], other)
+    question_cache.store([0.9, 0.1], response)
+
+    hit = question_cache.lookup([0.9, 0.1])
+
+    assert hit.response.answer == "Test answer"
+
+
+def test_lookup_skips_answers_from_other_modes(question_cache, response):
+    question_cache.store([1.0, 0.0], response, mode="fast")
+
+    assert question_cache.lookup([1.0, 0.0]) is None
+    assert question_cache.lookup([1.0, 0.0], mode="local") is None
+    assert question_cache.lookup([1.0, 0.0], mode="fast").response == response
+
+
+def test_answers_cached_without_mode_are_not_reused(tmp_path, response):
+    path = tmp_path / "questions.sqlite"
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE answers (id INTEGER PRIMARY KEY, question TEXT NOT NULL, "
+        "embedding BLOB NOT NULL, response TEXT NOT NULL, created_at REAL NOT NULL)"
+    )
+    conn.execute(
+        "INSERT INTO answers (question, embedding, response, created_at) "
+        "VALUES (?, ?, ?, ?)",
+        ("test question", pack_vector([1.0, 0.0]), response.model_dump_json(), 0.0),
+    )
+    conn.commit()
+    conn.close()
+
+    cache = QuestionCache(path=path, max_age_days=100_000)
+    assert cache.lookup([1.0, 0.0]) is None
+    cache.store([1.0, 0.0], response)
+    assert cache.lookup([1.0, 0.0]).response == response
+    cache.close()
+
+
+def test_hit_rate_persists(tmp_path, response):
+    path = tmp_path / "questions.sqlite"
+    cache = QuestionCache(path=path)
+    assert cache.hit_rate() == 0.0
+    cache.store([1.0, 0.0], response)
+    cache.lookup([1.0, 0.0])
+    cache.lookup([0.0, 1.0])
+    cache.close()
+
+    reopened = QuestionCache(path=path)
+    assert reopened.stats() == (1, 1)
+    assert reopened.hit_rate() == 0.5
+    reopened.close()
@@ -1,11 +1,27 @@
+import json
+import time
 from unittest.mock import MagicMock, patch
 
 import pytest
 from click.testing import CliRunner
 from rich.console import Console
 
+from askweb.cache import CacheHit
 from askweb.cli import main
-from askweb.models import SearchResult, SearchResponse, Reference, AnalyzedContent
+from askweb.index import IndexMatch
+from askweb.models import (
+    AnalyzedContent,
+    PlannedQuery,
+    Reference,
+    SearchResponse,
+    SearchResult,
+)
+
+
+def plan(*queries):
+    return [
+        PlannedQuery(query=query, priority=1, expected_results=5) for query in queries
+    ]
 
 
 @pytest.fixture
@@ -16,28 +32,47 @@ def mock_console():
 @pytest.fixture
 def mock_dependencies(mock_console):
     with (
-        patch("askweb.cli.OpenAIClient") as mock_openai,
-        patch("askweb.cli.WebSearcher") as mock_searcher,
-        patch("askweb.cli.ContentExtractor") as mock_extractor,
-        patch("askweb.cli.ContentAnalyzer") as mock_analyzer,
-        patch("askweb.cli.Console", return_value=mock_console),
+        patch("askweb.pipeline.OpenAIClient") as mock_openai,
+        patch("askweb.pipeline.WebSearcher") as mock_searcher,
+        patch("askweb.pipeline.ContentExtractor") as mock_extractor,
+        patch("askweb.pipeline.DomainBlocklist"),
+        patch("askweb.pipeline.ContentAnalyzer") as mock_analyzer,
+        patch("askweb.pipeline.ContentIndex") as mock_index,
+        patch("askweb.pipeline.QuestionCache") as mock_cache,
+        patch("askweb.pipeline.FetchScheduler") as mock_fetch_scheduler,
+        patch("askweb.pipeline.RunJournal") as mock_journal,
+        patch("askweb.cli.console", mock_console),
     ):
         # Setup mock returns
         mock_openai_instance = MagicMock()
         mock_searcher_instance = MagicMock()
         mock_extractor_instance = MagicMock()
         mock_analyzer_instance = MagicMock()
+        mock_index_instance = MagicMock()
+        mock_cache_instance = MagicMock()
+        mock_cache_instance.lookup.return_value = None
+        mock_cache_instance.stats.return_value = (0, 1)
 
         mock_openai.return_value = mock_openai_instance
+        mock_openai_instance.__enter__.return_value = mock_openai_instance
         mock_searcher.return_value = mock_searcher_instance
         mock_extractor.return_value = mock_extractor_instance
         mock_analyzer.return_value = mock_analyzer_instance
+        mock_index.return_value = mock_index_instance
+        mock_cache.return_value = mock_cache_instance
+        mock_fetch_scheduler.return_value.order.side_effect = list
+        mock_journal.return_value.is_empty = True
+        mock_journal.return_value.queries = None
+        mock_journal.return_value.search_results = {}
+        mock_journal.return_value.pages = {}
 
         yield {
             "openai": mock_openai_instance,
             "searcher": mock_searcher_instance,
             "extractor": mock_extractor_instance,
             "analyzer": mock_analyzer_instance,
+            "index": mock_index_instance,
+            "cache": mock_cache_instance,
             "console": mock_console,
         }
 
@@ -46,10 +81,9 @@ def test_main_success(mock_dependencies):
     runner = CliRunner()
     with patch.dict("os.environ", {"OPENAI_API_KEY": "test-key"}):
         # Setup mock responses
-        mock_dependencies["openai"].generate_search_queries.return_value = [
-            "query1",
-            "query2",
-        ]
+        mock_dependencies["openai"].generate_search_queries.return_value = plan(
+            "query1", "query2"
+        )
         search_result = SearchResult(
             title="Test Source",
             url="https://example.com",
@@ -99,7 +133,9 @@ def test_main_no_relevant_content(mock_dependencies):
     runner = CliRunner()
     with patch.dict("os.environ", {"OPENAI_API_KEY": "test-key"}):
         # Setup mock responses
-        mock_dependencies["openai"].generate_search_queries.return_value = ["query1"]
+        mock_dependencies["openai"].generate_search_queries.return_value = plan(
+            "query1"
+        )
         mock_dependencies["searcher"].search.return_value = [
             SearchResult(
                 title="Test Source",
@@ -118,14 +154,34 @@ def test_main_with_max_results(mock_dependencies):
     runner = CliRunner()
     with patch.dict("os.environ", {"OPENAI_API_KEY": "test-key"}):
         # Setup mock responses
-        mock_dependencies["openai"].generate_search_queries.return_value = ["query1"]
+        mock_dependencies["openai"].generate_search_queries.return_value = [
+            PlannedQuery(query="query1", priority=1, expected_results=8)
+        ]
         mock_dependencies["searcher"].search.return_value = []
 
-        result = runner.invoke(main, ["test question", "--max-results", "10"])
-        
+        result = runner.invoke(main, ["test question", "--max-results", "6"])
+
+        assert result.exit_code == 0
+        # The planned result count is capped by --max-results
+        mock_dependencies["searcher"].search.assert_called_once_with(
+            "query1", max_results=6
+        )
+
+
+def test_main_uses_planned_result_count_by_default(mock_dependencies):
+    runner = CliRunner()
+    with patch.dict("os.environ", {"OPENAI_API_KEY": "test-key"}):
+        mock_dependencies["openai"].generate_search_queries.return_value = [
+            PlannedQuery(query="query1", priority=1, expected_results=8)
+        ]
+        mock_dependencies["searcher"].search.return_value = []
+
+        result = runner.invoke(main, ["test question"])
+
         assert result.exit_code == 0
-        # Verify searcher was initialized with correct max_results
-        mock_dependencies["searcher"].search.assert_called_once_with("query1")
+        mock_dependencies["searcher"].search.assert_called_once_with(
+            "query1", max_results=8
+        )
 
 
 def test_main_save_api_key(mock_dependencies, tmp_path):
@@ -143,3 +199,335 @@ def test_main_save_api_key(mock_dependencies, tmp_path):
         assert result.exit_code == 0
         assert "API key saved!" in result.output
         assert 'export OPENAI_API_KEY="test-key"' in bashrc.read_text()
+
+
+def test_main_indexes_relevant_sources(mock_dependencies):
+    runner = CliRunner()
+    with patch.dict("os.environ", {"OPENAI_API_KEY": "test-key"}):
+        mock_dependencies["openai"].generate_search_queries.return_value = plan(
+            "query1"
+        )
+        mock_dependencies["searcher"].search.return_value = [
+            SearchResult(
+                title="Test Source", url="https://example.com", snippet="Test snippet"
+            )
+        ]
+        analyzed_content = AnalyzedContent(
+            title="Test Source",
+            url="https://example.com",
+            published="2024-01-01",
+            is_relevant=True,
+            content="Test content",
+        )
+        mock_dependencies["extractor"].extract.return_value = analyzed_content
+        mock_dependencies["analyzer"].analyze_content.return_value = analyzed_content
+        mock_dependencies["openai"].embed.return_value = [[0.1, 0.2]]
+        mock_dependencies[
+            "analyzer"
+        ].create_search_response.return_value = SearchResponse(
+            question="test question", answer="Test answer", references=[]
+        )
+
+        result = runner.invoke(main, ["test question"])
+
+        assert result.exit_code == 0
+        mock_dependencies["index"].add_many.assert_called_once_with(
+            [analyzed_content], [[0.1, 0.2]]
+        )
+
+
+def test_main_local_first_skips_web_search(mock_dependencies):
+    runner = CliRunner()
+    with patch.dict("os.environ", {"OPENAI_API_KEY": "test-key"}):
+        local_sources = [
+            IndexMatch(
+                content=AnalyzedContent(
+                    title=f"Local Source {i}",
+                    url=f"https://example.com/{i}",
+                    published="2024-01-01",
+                    is_relevant=True,
+                    content="Stored content",
+                ),
+                similarity=0.9,
+            )
+            for i in range(3)
+        ]
+        mock_dependencies["openai"].embed.return_value = [[0.1, 0.2]]
+        mock_dependencies["index"].search.return_value = local_sources
+        mock_dependencies[
+            "analyzer"
+        ].create_search_response.return_value = SearchResponse(
+            question="test question", answer="Test answer", references=[]
+        )
+
+        result = runner.invoke(main, ["test question", "--local-first"])
+
+        assert result.exit_code == 0
+        mock_dependencies["openai"].generate_search_queries.assert_not_called()
+        mock_dependencies["searcher"].search.assert_not_called()
+        mock_dependencies["analyzer"].create_search_response.assert_called_once_with(
+            [match.content for match in local_sources], "test question"
+        )
+
+
+def test_main_local_first_cutoffs_are_configurable(mock_dependencies):
+    runner = CliRunner()
+    with patch.dict("os.environ", {"OPENAI_API_KEY": "test-key"}):
+        mock_dependencies["openai"].embed.return_value = [[0.1, 0.2]]
+        mock_dependencies["index"].search.return_value = [
+            IndexMatch(
+                content=AnalyzedContent(
+                    title=f"Local Source {i}",
+                    url=f"https://example.com/{i}",
+                    published="2024-01-01",
+                    is_relevant=True,
+                    content="Stored content",
+                ),
+                similarity=0.9,
+            )
+            for i in range(3)
+        ]
+        mock_dependencies["openai"].generate_search_queries.return_value = plan(
+            "query1"
+        )
+        mock_dependencies["searcher"].search.return_value = []
+
+        result = runner.invoke(
+            main,
+            [
+                "test question",
+                "--local-first",
+                "--local-threshold",
+                "0.8",
+                "--local-min-sources",
+                "5",
+            ],
+        )
+
+        assert result.exit_code == 0
+        assert mock_dependencies["index"].search.call_args.kwargs[
+            "min_similarity"
+        ] == pytest.approx(0.8)
+        # Three matches are not enough when five are required
+        mock_dependencies["searcher"].search.assert_called_once()
+
+
+def test_main_returns_cached_answer(mock_dependencies):
+    runner = CliRunner()
+    with patch.dict("os.environ", {"OPENAI_API_KEY": "test-key"}):
+        mock_dependencies["openai"].embed.return_value = [[0.1, 0.2]]
+        mock_dependencies["cache"].lookup.return_value = CacheHit(
+            response=SearchResponse(
+                question="earlier question",
+                answer="Cached answer",
+                references=[Reference(title="Test Source", url="https://example.com")],
+            ),
+            similarity=0.97,
+        )
+        mock_dependencies["cache"].stats.return_value = (1, 1)
+
+        result = runner.invoke(main, ["test question"])
+
+        assert result.exit_code == 0
+        assert "hit rate 50%" in result.output
+        # The heading shows the question asked now
+        assert "# test question" in result.output
+        assert "# earlier question" not in result.output
+        mock_dependencies["cache"].lookup.assert_called_once_with([0.1, 0.2], "full")
+        mock_dependencies["openai"].generate_search_queries.assert_not_called()
+        mock_dependencies["analyzer"].create_search_response.assert_not_called()
+
+
+def test_main_looks_up_and_stores_answers_per_mode(mock_dependencies):
+    runner = CliRunner()
+    with patch.dict("os.environ", {"OPENAI_API_KEY": "test-key"}):
+        mock_dependencies["openai"].embed.return_value = [[0.1, 0.2]]
+        mock_dependencies["openai"].generate_search_queries.return_value = plan(
+            "query1"
+        )
+        mock_dependencies["searcher"].search.return_value = [
+            SearchResult(title="Source", url="https://example.com", snippet="Fact")
+        ]
+        response = SearchResponse(
+            question="test question", answer="Snippet answer", references=[]
+        )
+        mock_dependencies["openai"].answer_from_snippets.return_value = response
+
+        result = runner.invoke(main, ["test question", "--fast"])
+
+        assert result.exit_code == 0
+        mock_dependencies["cache"].lookup.assert_called_once_with([0.1, 0.2], "fast")
+        mock_dependencies["cache"].store.assert_called_once_with(
+            [0.1, 0.2], response, "fast"
+        )
+
+
+def test_main_refresh_bypasses_cache(mock_dependencies):
+    runner = CliRunner()
+    with patch.dict("os.environ", {"OPENAI_API_KEY": "test-key"}):
+        mock_dependencies["openai"].embed.return_value = [[0.1, 0.2]]
+        mock_dependencies["openai"].generate_search_queries.return_value = plan(
+            "query1"
+        )
+        mock_dependencies["searcher"].search.return_value = []
+
+        result = runner.invoke(main, ["test question", "--refresh"])
+
+        assert result.exit_code == 0
+        mock_dependencies["cache"].lookup.assert_not_called()
+        mock_dependencies["openai"].generate_search_queries.assert_called_once()
+
+
+def test_main_stops_after_max_sources(mock_dependencies):
+    runner = CliRunner()
+    with patch.dict("os.environ", {"OPENAI_API_KEY": "test-key"}):
+        mock_dependencies["openai"].generate_search_queries.return_value = plan(
+            "query1"
+        )
+        mock_dependencies["searcher"].search.return_value = [
+            SearchResult(
+                title=f"Source {i}", url=f"https://example.com/{i}", snippet="Snippet"
+            )
+            for i in range(20)
+        ]
+        analyzed_content = AnalyzedContent(
+            title="Test Source",
+            url="https://example.com",
+            published=None,
+            is_relevant=True,
+            content="Test content",
+        )
+
+        def slow_extract(result):
+            time.sleep(0.05)
+            return analyzed_content
+
+        mock_dependencies["extractor"].extract.side_effect = slow_extract
+        mock_dependencies["analyzer"].analyze_content.return_value = analyzed_content
+        mock_dependencies[
+            "analyzer"
+        ].create_search_response.return_value = SearchResponse(
+            question="test question", answer="Test answer", references=[]
+        )
+
+        result = runner.invoke(
+            main, ["test question", "--max-sources", "2", "--workers", "1"]
+        )
+
+        assert result.exit_code == 0
+        sources = mock_dependencies["analyzer"].create_search_response.call_args[0][0]
+        assert len(sources) == 2
+        assert mock_dependencies["extractor"].extract.call_count < 20
+
+
+def test_main_fast_answers_from_snippets(mock_dependencies):
+    runner = CliRunner()
+    with patch.dict("os.environ", {"OPENAI_API_KEY": "test-key"}):
+        mock_dependencies["openai"].generate_search_queries.return_value = plan(
+            "query1"
+        )
+        mock_dependencies["searcher"].search.return_value = [
+            SearchResult(
+                title="Test Source", url="https://example.com", snippet="Test snippet"
+            )
+        ]
+        mock_dependencies["openai"].answer_from_snippets.return_value = SearchResponse(
+            question="test question",
+            answer="Snippet answer",
+            references=[Reference(title="Test Source", url="https://example.com")],
+        )
+
+        result = runner.invoke(main, ["test question", "--fast"])
+
+        assert result.exit_code == 0
+        assert "Snippet answer" in result.output
+        mock_dependencies["extractor"].extract.assert_not_called()
+        mock_dependencies["analyzer"].create_search_response.assert_not_called()
+
+
+def test_main_fast_falls_back_to_pages(mock_dependencies):
+    runner = CliRunner()
+    with patch.dict("os.environ", {"OPENAI_API_KEY": "test-key"}):
+        mock_dependencies["openai"].generate_search_queries.return_value = plan(
+            "query1"
+        )
+        mock_dependencies["searcher"].search.return_value = [
+            SearchResult(
+                title="Test Source", url="https://example.com", snippet="Test snippet"
+            )
+        ]
+        mock_dependencies["openai"].answer_from_snippets.return_value = None
+        mock_dependencies["extractor"].extract.return_value = None
+
+        result = runner.invoke(main, ["test question", "--fast"])
+
+        assert result.exit_code == 0
+        assert "Snippets are not enough" in result.output
+        mock_dependencies["extractor"].extract.assert_called_once()
+
+
+def test_main_json_output(mock_dependencies):
+    runner = CliRunner()
+    with patch.dict("os.environ", {"OPENAI_API_KEY": "test-key"}):
+        mock_dependencies["openai"].generate_search_queries.return_value = plan(
+            "query1"
+        )
+        mock_dependencies["searcher"].search.return_value = [
+            SearchResult(
+                title="Test Source", url="https://example.com", snippet="Test snippet"
+            )
+        ]
+        mock_dependencies["openai"].answer_from_snippets.return_value = SearchResponse(
+            question="test question",
+            answer="Snippet answer",
+            references=[Reference(title="Test Source", url="https://example.com")],
+        )
+
+        result = runner.invoke(main, ["test question", "--fast", "--output", "json"])
+
+        assert result.exit_code == 0
+        data = json.loads(result.stdout)
+        assert data["response"]["answer"] == "Snippet answer"
+        assert data["response"]["references"][0]["url"] == "https://example.com/"
+        stages = [event["stage"] for event in data["events"]]
+        assert stages.index("queries") < stages.index("search")
+
+
+def test_main_ndjson_output(mock_dependencies):
+    runner = CliRunner()
+    with patch.dict("os.environ", {"OPENAI_API_KEY": "test-key"}):
+        mock_dependencies["openai"].generate_search_queries.return_value = plan(
+            "query1"
+        )
+        mock_dependencies["searcher"].search.return_value = []
+
+        result = runner.invoke(main, ["test question", "--output", "ndjson"])
+
+        assert result.exit_code == 0
+        events = [json.loads(line) for line in result.stdout.splitlines()]
+        queries = next(
+            event
+            for event in events
+            if event["stage"] == "queries" and event["kind"] == "end"
+        )
+        assert queries["data"]["queries"] == ["query1"]
+        assert events[-1]["message"] == "No relevant answers found."
+
+
+def test_main_profile_writes_reports(mock_dependencies, tmp_path):
+    runner = CliRunner()
+    with patch.dict("os.environ", {"OPENAI_API_KEY": "test-key"}):
+        mock_dependencies["openai"].generate_search_queries.return_value = plan(
+            "query1"
+        )
+        mock_dependencies["searcher"].search.return_value = []
+        out_dir = tmp_path / "profile"
+
+        result = runner.invoke(
+            main,
+            ["test question", "--profile", "both", "--profile-out", str(out_dir)],
+        )
+
+        assert result.exit_code == 0
+        assert (out_dir / "search.pstats").exists()
+        assert "== search: peak" in (out_dir / "memory.txt").read_text()
@@ -1,9 +1,19 @@
+import json
+import time
+import urllib.error
 from unittest.mock import MagicMock, patch
 
 import pytest
 from rich.console import Console
 
-from askweb.content import ContentExtractor
+from askweb.content import (
+    ContentExtractor,
+    DomainBlocklist,
+    ProbeResult,
+    _probe_result,
+)
+from askweb.fetch import FetchScheduler
+from askweb.metrics import RunMetrics
 from askweb.models import SearchResult
 
 
@@ -12,6 +22,16 @@ def mock_console():
     return MagicMock(spec=Console)
 
 
+@pytest.fixture(autouse=True)
+def mock_probe():
+    # No network access in tests; None means the probe could not reach the host
+    with (
+        patch("askweb.content.probe_url", return_value=None) as mock_probe,
+        patch.object(FetchScheduler, "_fetch_robots", return_value=None),
+    ):
+        yield mock_probe
+
+
 @pytest.fixture
 def search_result():
     return SearchResult(
@@ -19,6 +39,10 @@ def search_result():
     )
 
 
+def page(html="downloaded content", status=200):
+    return MagicMock(status=status, html=html)
+
+
 @pytest.fixture
 def mock_metadata():
     metadata = MagicMock()
@@ -30,7 +54,7 @@ def mock_metadata():
 def test_extract_success(search_result, mock_metadata):
     with patch("askweb.content.trafilatura") as mock_trafilatura:
         # Setup mock returns
-        mock_trafilatura.fetch_url.return_value = "downloaded content"
+        mock_trafilatura.fetch_response.return_value = page()
         mock_trafilatura.extract.return_value = "extracted content"
         mock_trafilatura.extract_metadata.return_value = mock_metadata
 
@@ -58,19 +82,22 @@ def test_extract_success(search_result, mock_metadata):
 
 def test_extract_no_content(search_result, mock_metadata):
     with patch("askweb.content.trafilatura") as mock_trafilatura:
-        mock_trafilatura.fetch_url.return_value = "downloaded content"
+        mock_trafilatura.fetch_response.return_value = page()
         mock_trafilatura.extract.return_value = None  # No content extracted
         mock_trafilatura.extract_metadata.return_value = mock_metadata
+        metrics = RunMetrics()
 
-        extractor = ContentExtractor()
+        extractor = ContentExtractor(metrics=metrics)
         content = extractor.extract(search_result)
 
         assert content is None
+        assert metrics.with_prefix("rejected") == {"no_text": 1}
+        assert metrics.get("extraction.failed") == 0
 
 
 def test_extract_download_failure(search_result):
     with patch("askweb.content.trafilatura") as mock_trafilatura:
-        mock_trafilatura.fetch_url.return_value = None  # Download failed
+        mock_trafilatura.fetch_response.return_value = None  # Download failed
 
         extractor = ContentExtractor()
         content = extractor.extract(search_result)
@@ -80,7 +107,7 @@ def test_extract_download_failure(search_result):
 
 def test_extract_with_error(search_result):
     with patch("askweb.content.trafilatura") as mock_trafilatura:
-        mock_trafilatura.fetch_url.side_effect = Exception("Download failed")
+        mock_trafilatura.fetch_response.side_effect = Exception("Download failed")
 
         extractor = ContentExtractor()
         content = extractor.extract(search_result)
@@ -91,7 +118,7 @@ def test_extract_with_error(search_result):
 def test_extract_no_metadata(search_result):
     with patch("askweb.content.trafilatura") as mock_trafilatura:
         # Setup mock returns
-        mock_trafilatura.fetch_url.return_value = "downloaded content"
+        mock_trafilatura.fetch_response.return_value = page()
         mock_trafilatura.extract.return_value = "extracted content"
         mock_trafilatura.extract_metadata.return_value = None
 
@@ -101,3 +128,273 @@ def test_extract_no_metadata(search_result):
 
         # Verify
         assert content is None
+
+
+@pytest.mark.parametrize(
+    "probe, reason",
+    [
+        (ProbeResult(200, "application/pdf", 1000), "content_type"),
+        (ProbeResult(200, "application/zip", None), "content_type"),
+        (ProbeResult(200, "text/html", 50 * 1024 * 1024), "too_large"),
+    ],
+)
+def test_extract_rejects_before_download(search_result, mock_probe, probe, reason):
+    mock_probe.return_value = probe
+    metrics = RunMetrics()
+
+    with patch("askweb.content.trafilatura") as mock_trafilatura:
+        extractor = ContentExtractor(metrics=metrics)
+        content = extractor.extract(search_result)
+
+        assert content is None
+        mock_trafilatura.fetch_response.assert_not_called()
+        assert metrics.with_prefix("rejected") == {reason: 1}
+
+
+def test_extract_downloads_when_probe_is_refused(
+    search_result, mock_probe, mock_metadata, tmp_path
+):
+    # Bot protection often answers HEAD with 403 while a normal GET works
+    mock_probe.return_value = ProbeResult(403, "text/html", None)
+    blocklist = DomainBlocklist(path=tmp_path / "blocklist.json", threshold=1)
+
+    with patch("askweb.content.trafilatura") as mock_trafilatura:
+        mock_trafilatura.fetch_response.return_value = page()
+        mock_trafilatura.extract.return_value = "extracted content"
+        mock_trafilatura.extract_metadata.return_value = mock_metadata
+
+        extractor = ContentExtractor(blocklist=blocklist)
+        content = extractor.extract(search_result)
+
+    assert content.content == "extracted content"
+    assert not blocklist.is_blocked("example.com")
+
+
+def test_extract_accepts_html(search_result, mock_probe, mock_metadata):
+    mock_probe.return_value = ProbeResult(200, "text/html", 1000)
+
+    with patch("askweb.content.trafilatura") as mock_trafilatura:
+        mock_trafilatura.fetch_response.return_value = page()
+        mock_trafilatura.extract.return_value = "extracted content"
+        mock_trafilatura.extract_metadata.return_value = mock_metadata
+
+        extractor = ContentExtractor(max_bytes=2000)
+        content = extractor.extract(search_result)
+
+        assert content is not None
+        # The byte cap is passed on to the downloader
+        config = mock_trafilatura.fetch_response.call_args.kwargs["config"]
+        assert config.getint("DEFAULT", "MAX_FILE_SIZE") == 2000
+
+
+def test_extract_blocks_domain_after_refused_downloads(search_result, tmp_path):
+    blocklist = DomainBlocklist(path=tmp_path / "blocklist.json", threshold=2)
+    metrics = RunMetrics()
+
+    with patch("askweb.content.trafilatura") as mock_trafilatura:
+        mock_trafilatura.fetch_response.return_value = page(html=None, status=403)
+        extractor = ContentExtractor(blocklist=blocklist, metrics=metrics)
+
+        for _ in range(3):
+            extractor.extract(search_result)
+
+        assert mock_trafilatura.fetch_response.call_count == 2
+        assert metrics.get("rejected.forbidden") == 2
+        assert metrics.get("rejected.blocklisted") == 1
+
+
+def test_pages_without_text_do_not_block_domain(search_result, tmp_path):
+    blocklist = DomainBlocklist(path=tmp_path / "blocklist.json", threshold=2)
+    metrics = RunMetrics()
+
+    with patch("askweb.content.trafilatura") as mock_trafilatura:
+        mock_trafilatura.fetch_response.return_value = page()
+        mock_trafilatura.extract.return_value = None
+        extractor = ContentExtractor(blocklist=blocklist, metrics=metrics)
+
+        for _ in range(3):
+            extractor.extract(search_result)
+
+    assert not blocklist.is_blocked("example.com")
+    assert metrics.get("rejected.no_text") == 3
+
+
+def test_non_html_rejections_do_not_block_domain(search_result, mock_probe, tmp_path):
+    blocklist = DomainBlocklist(path=tmp_path / "blocklist.json", threshold=2)
+    mock_probe.return_value = ProbeResult(200, "application/pdf", 1000)
+
+    with patch("askweb.content.trafilatura"):
+        extractor = ContentExtractor(blocklist=blocklist)
+        for _ in range(3):
+            extractor.extract(search_result)
+
+    assert not blocklist.is_blocked("example.com")
+    # A later run with PDF support still reaches the documents
+    assert not DomainBlocklist(path=tmp_path / "blocklist.json").is_blocked(
+        "example.com"
+    )
+
+
+def test_network_failures_do_not_block_domain(search_result, tmp_path):
+    blocklist = DomainBlocklist(path=tmp_path / "blocklist.json", threshold=2)
+    scheduler = FetchScheduler(path=tmp_path / "hosts.json", failure_threshold=10)
+
+    with patch("askweb.content.trafilatura") as mock_trafilatura:
+        mock_trafilatura.fetch_response.side_effect = TimeoutError("timed out")
+        extractor = ContentExtractor(blocklist=blocklist, scheduler=scheduler)
+        for _ in range(3):
+            extractor.extract(search_result)
+
+    assert not blocklist.is_blocked("example.com")
+
+
+def test_blocklist_persists(tmp_path):
+    path = tmp_path / "blocklist.json"
+    blocklist = DomainBlocklist(path=path, threshold=2)
+    blocklist.record_failure("example.com")
+    blocklist.record_success("example.com")
+    blocklist.record_failure("example.com")
+    assert not blocklist.is_blocked("example.com")
+    blocklist.record_failure("example.com")
+    assert blocklist.is_blocked("example.com")
+
+    assert DomainBlocklist(path=path).is_blocked("example.com")
+    assert not DomainBlocklist(path=path).is_blocked("example.org")
+
+
+def test_blocklist_shortens_saved_blocks(tmp_path):
+    path = tmp_path / "blocklist.json"
+    week = time.time() + 7 * 86400
+    path.write_text(json.dumps({"blocked_until": {"example.com": week}}))
+
+    blocklist = DomainBlocklist(path=path, block_hours=1)
+    assert blocklist.is_blocked("example.com")
+    with patch("askweb.content.time.time", return_value=time.time() + 7200):
+        assert not blocklist.is_blocked("example.com")
+
+
+def test_extract_pdf(search_result, mock_probe, tmp_path):
+    mock_probe.return_value = ProbeResult(200, "application/pdf", 1000)
+    page = MagicMock()
+    page.extract_text.return_value = "pdf text"
+    reader = MagicMock()
+    reader.pages = [page, page]
+    reader.metadata.title = "PDF Title"
+    reader.metadata.creation_date = None
+    response = MagicMock()
+    response.__enter__.return_value.status = 200
+    response.__enter__.return_value.read.return_value = b"%PDF-1.7"
+    metrics = RunMetrics()
+    scheduler = FetchScheduler(path=tmp_path / "hosts.json")
+
+    with (
+        patch("askweb.content.PdfReader", return_value=reader),
+        patch("askweb.content.urllib.request.urlopen", return_value=response),
+        patch("askweb.content.trafilatura") as mock_trafilatura,
+    ):
+        extractor = ContentExtractor(metrics=metrics, pdf=True, scheduler=scheduler)
+        content = extractor.extract(search_result)
+
+        assert content.title == "PDF Title"
+        assert content.content == "pdf text\n\npdf text"
+        assert metrics.get("extraction.pdf") == 1
+        mock_trafilatura.fetch_response.assert_not_called()
+    # The download gave the host a latency sample
+    assert scheduler._hosts["example.com"].samples == 1
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        TimeoutError("timed out"),
+        urllib.error.HTTPError("https://example.com", 503, "Unavailable", {}, None),
+    ],
+)
+def test_extract_pdf_failure_counts_against_host(
+    search_result, mock_probe, tmp_path, error
+):
+    mock_probe.return_value = ProbeResult(200, "application/pdf", 1000)
+    scheduler = FetchScheduler(path=tmp_path / "hosts.json")
+    metrics = RunMetrics()
+
+    with (
+        patch("askweb.content.PdfReader") as mock_reader,
+        patch("askweb.content.urllib.request.urlopen", side_effect=error),
+    ):
+        extractor = ContentExtractor(metrics=metrics, pdf=True, scheduler=scheduler)
+        assert extractor.extract(search_result) is None
+
+    mock_reader.assert_not_called()
+    assert scheduler._hosts["example.com"].consecutive_failures == 1
+    assert metrics.get("extraction.failed") == 1
+
+
+def test_probe_result_parsing():
+    head = _probe_result(
+        200, {"Content-Type": "text/html; charset=utf-8", "Content-Length": "512"}
+    )
+    assert head == ProbeResult(200, "text/html", 512)
+
+    ranged = _probe_result(
+        206, {"Content-Type": "application/pdf", "Content-Range": "bytes 0-0/4096"}
+    )
+    assert ranged == ProbeResult(206, "application/pdf", 4096)
+
+    assert _probe_result(200, {}) == ProbeResult(200, None, None)
+
+
+def test_extract_skips_unhealthy_host(search_result, tmp_path):
+    scheduler = FetchScheduler(path=tmp_path / "hosts.json", failure_threshold=2)
+    metrics = RunMetrics()
+
+    with patch("askweb.content.trafilatura") as mock_trafilatura:
+        mock_trafilatura.fetch_response.side_effect = TimeoutError("timed out")
+        extractor = ContentExtractor(metrics=metrics, scheduler=scheduler)
+
+        for _ in range(3):
+            extractor.extract(search_result)
+
+        assert mock_trafilatura.fetch_response.call_count == 2
+        assert metrics.get("rejected.unhealthy_host") == 1
+
+
+@pytest.mark.parametrize("status, failures", [(404, 0), (410, 0), (503, 1)])
+def test_extract_counts_only_server_errors_against_host(
+    search_result, tmp_path, status, failures
+):
+    scheduler = FetchScheduler(path=tmp_path / "hosts.json")
+    metrics = RunMetrics()
+
+    with patch("askweb.content.trafilatura") as mock_trafilatura:
+        mock_trafilatura.fetch_response.return_value = page(html=None, status=status)
+        extractor = ContentExtractor(metrics=metrics, scheduler=scheduler)
+        assert extractor.extract(search_result) is None
+
+    assert scheduler._hosts["example.com"].consecutive_failures == failures
+    assert metrics.get("extraction.failed") == 1
+
+
+def test_extract_counts_unreachable_url_once(search_result, tmp_path):
+    scheduler = FetchScheduler(path=tmp_path / "hosts.json")
+
+    with patch("askweb.content.trafilatura") as mock_trafilatura:
+        # Neither the probe (mocked to None) nor the download reach the host
+        mock_trafilatura.fetch_response.return_value = None
+        ContentExtractor(scheduler=scheduler).extract(search_result)
+
+    assert scheduler._hosts["example.com"].consecutive_failures == 1
+
+
+def test_extract_respects_robots(search_result, tmp_path):
+    scheduler = FetchScheduler(path=tmp_path / "hosts.json")
+    metrics = RunMetrics()
+
+    with (
+        patch.object(scheduler, "can_fetch", return_value=False),
+        patch("askweb.content.trafilatura") as mock_trafilatura,
+    ):
+        extractor = ContentExtractor(metrics=metrics, scheduler=scheduler)
+
+        assert extractor.extract(search_result) is None
+        mock_trafilatura.fetch_response.assert_not_called()
+        assert metrics.get("rejected.robots") == 1
@@ -0,0 +1,154 @@
+import threading
+import time
+from unittest.mock import MagicMock, patch
+from urllib.robotparser import RobotFileParser
+
+import pytest
+
+from askweb.fetch import ROBOTS_AGENT, USER_AGENT, FetchScheduler
+from askweb.models import SearchResult
+
+
+@pytest.fixture
+def scheduler(tmp_path):
+    return FetchScheduler(path=tmp_path / "hosts.json", failure_threshold=2)
+
+
+def make_result(url):
+    return SearchResult(title="Test Title", url=url, snippet="Test snippet")
+
+
+def test_circuit_breaker(scheduler):
+    scheduler.record_failure("slow.com")
+    assert scheduler.is_available("slow.com")
+    scheduler.record_failure("slow.com")
+    assert not scheduler.is_available("slow.com")
+
+    # Half-open after the cooldown: one more failure reopens the circuit
+    scheduler._hosts["slow.com"].open_until = time.time() - 1
+    assert scheduler.is_available("slow.com")
+    scheduler.record_failure("slow.com")
+    assert not scheduler.is_available("slow.com")
+
+    scheduler._hosts["slow.com"].open_until = time.time() - 1
+    scheduler.record_success("slow.com", 1.0)
+    scheduler.record_failure("slow.com")
+    assert scheduler.is_available("slow.com")
+
+
+def test_half_open_lets_single_trial_through(scheduler):
+    scheduler.record_failure("slow.com")
+    scheduler.record_failure("slow.com")
+    scheduler._hosts["slow.com"].open_until = time.time() - 1
+
+    results = []
+    barrier = threading.Barrier(4)
+
+    def check():
+        barrier.wait()
+        results.append(scheduler.is_available("slow.com"))
+
+    threads = [threading.Thread(target=check) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(results) == [False, False, False, True]
+
+    # The trial succeeded, the circuit is closed again for everyone
+    scheduler.record_success("slow.com", 1.0)
+    assert scheduler.is_available("slow.com")
+    assert scheduler.is_available("slow.com")
+
+
+def test_latency_history_persists(tmp_path):
+    path = tmp_path / "hosts.json"
+    scheduler = FetchScheduler(path=path)
+    scheduler.record_success("example.com", 1.0)
+    scheduler.record_success("example.com", 2.0)
+    scheduler.save()
+
+    reopened = FetchScheduler(path=path)
+    assert reopened.expected_latency("example.com") == pytest.approx(1.3)
+    assert reopened._hosts["example.com"].samples == 2
+
+
+def test_order_prefers_fast_hosts_round_robin(scheduler):
+    scheduler.record_success("fast.com", 0.2)
+    scheduler.record_success("slow.com", 5.0)
+    scheduler.record_success("medium.com", 1.0)
+    for _ in range(2):
+        scheduler.record_failure("broken.com")
+
+    results = [
+        make_result("https://slow.com/1"),
+        make_result("https://fast.com/1"),
+        make_result("https://fast.com/2"),
+        make_result("https://broken.com/1"),
+        make_result("https://medium.com/1"),
+    ]
+
+    ordered = [str(r.url) for r in scheduler.order(results)]
+
+    assert ordered == [
+        "https://fast.com/1",
+        "https://medium.com/1",
+        "https://slow.com/1",
+        "https://broken.com/1",
+        "https://fast.com/2",
+    ]
+
+
+def test_host_slot_limits_concurrency(tmp_path):
+    scheduler = FetchScheduler(path=tmp_path / "hosts.json", per_host=2)
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def fetch():
+        nonlocal active, peak
+        with scheduler.host_slot("example.com"):
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            time.sleep(0.02)
+            with lock:
+                active -= 1
+
+    threads = [threading.Thread(target=fetch) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert peak == 2
+
+
+def test_can_fetch_caches_robots(scheduler):
+    parser = RobotFileParser()
+    parser.parse(["User-agent: *", "Disallow: /private"])
+
+    with patch.object(scheduler, "_fetch_robots", return_value=parser) as mock_fetch:
+        assert scheduler.can_fetch("https://example.com/public")
+        assert not scheduler.can_fetch("https://example.com/private/page")
+
+    mock_fetch.assert_called_once_with("https://example.com")
+
+
+def test_can_fetch_allows_when_robots_unavailable(scheduler):
+    with patch.object(scheduler, "_fetch_robots", return_value=None):
+        assert scheduler.can_fetch("https://example.com/page")
+
+
+def test_fetch_robots_sends_user_agent(scheduler):
+    response = MagicMock()
+    response.__enter__.return_value.read.return_value = b"User-agent: *\nDisallow:"
+
+    with patch("askweb.fetch.urllib.request.urlopen", return_value=response) as urlopen:
+        parser = scheduler._fetch_robots("https://example.com")
+
+    request = urlopen.call_args.args[0]
+    assert request.full_url == "https://example.com/robots.txt"
+    assert request.get_header("User-agent") == USER_AGENT
+    assert parser.can_fetch(ROBOTS_AGENT, "https://example.com/page")
@@ -0,0 +1,98 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from askweb import index as index_module
+from askweb.index import ContentIndex, is_fresh
+from askweb.models import AnalyzedContent
+
+
+@pytest.fixture
+def content_index(tmp_path):
+    index = ContentIndex(path=tmp_path / "index.sqlite", num_tables=4, num_bits=4)
+    yield index
+    index.close()
+
+
+def make_content(url, published="2024-01-01", content="Test content"):
+    return AnalyzedContent(
+        title="Test Title",
+        url=url,
+        published=published,
+        is_relevant=True,
+        content=content,
+    )
+
+
+def test_search_returns_most_similar(content_index):
+    content_index.add(make_content("https://example.com/a"), [1.0, 0.0, 0.0])
+    content_index.add(make_content("https://example.com/b"), [0.0, 1.0, 0.0])
+    content_index.add(make_content("https://example.com/c"), [0.9, 0.1, 0.0])
+
+    matches = content_index.search([1.0, 0.0, 0.0], limit=2)
+
+    assert [str(m.content.url) for m in matches] == [
+        "https://example.com/a",
+        "https://example.com/c",
+    ]
+    assert matches[0].similarity == pytest.approx(1.0)
+    assert matches[0].content.is_relevant
+
+
+def test_search_min_similarity(content_index):
+    content_index.add(make_content("https://example.com/a"), [1.0, 0.0])
+    content_index.add(make_content("https://example.com/b"), [0.0, 1.0])
+
+    matches = content_index.search([1.0, 0.0], min_similarity=0.5)
+
+    assert len(matches) == 1
+
+
+def test_add_replaces_existing_url(content_index):
+    content_index.add(make_content("https://example.com/a"), [1.0, 0.0])
+    content_index.add(make_content("https://example.com/a", content="New"), [0.0, 1.0])
+
+    assert len(content_index) == 1
+    matches = content_index.search([0.0, 1.0])
+    assert matches[0].content.content == "New"
+
+
+def test_add_skips_empty_content(content_index):
+    content_index.add(make_content("https://example.com/a", content=None), [1.0])
+
+    assert len(content_index) == 0
+
+
+def test_search_uses_lsh_buckets(content_index, monkeypatch):
+    monkeypatch.setattr(index_module, "EXACT_SEARCH_LIMIT", 0)
+    content_index.add(make_content("https://example.com/a"), [1.0, 0.2, 0.1])
+    content_index.add(make_content("https://example.com/b"), [-1.0, -0.2, -0.1])
+
+    matches = content_index.search([1.0, 0.2, 0.1])
+
+    # The opposite vector falls into a different bucket in every table
+    assert [str(m.content.url) for m in matches] == ["https://example.com/a"]
+
+
+def test_index_persists_between_instances(tmp_path):
+    path = tmp_path / "index.sqlite"
+    index = ContentIndex(path=path)
+    index.add(make_content("https://example.com/a"), [1.0, 0.0])
+    index.close()
+
+    reopened = ContentIndex(path=path)
+    assert len(reopened.search([1.0, 0.0])) == 1
+    reopened.close()
+
+
+def test_is_fresh():
+    now = datetime.now()
+    recent = (now - timedelta(days=2)).strftime("%Y-%m-%d")
+    old = (now - timedelta(days=60)).strftime("%Y-%m-%d")
+
+    assert is_fresh(recent, now.timestamp(), max_age_days=30)
+    assert not is_fresh(old, now.timestamp(), max_age_days=30)
+    assert is_fresh(old, now.timestamp(), max_age_days=None)
+    # Unknown publication date falls back to the indexing time
+    assert is_fresh(None, now.timestamp(), max_age_days=30)
+    assert is_fresh("not a date", now.timestamp(), max_age_days=30)
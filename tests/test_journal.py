@@ -0,0 +1,84 @@
+from askweb.journal import RunJournal
+from askweb.models import AnalyzedContent, PlannedQuery, SearchResult
+
+
+def make_page(url, is_relevant=True):
+    return AnalyzedContent(
+        title="Source",
+        url=url,
+        published=None,
+        is_relevant=is_relevant,
+        content="Relevant passage",
+    )
+
+
+def plan(*queries):
+    return [
+        PlannedQuery(query=query, priority=1, expected_results=5) for query in queries
+    ]
+
+
+def test_resume_replays_completed_work(tmp_path):
+    path = tmp_path / "run.jsonl"
+    result = SearchResult(title="Source", url="https://example.com", snippet="s")
+    with RunJournal("question", path=path) as journal:
+        journal.record_queries(plan("query1", "query2"))
+        journal.record_search("query1", [result])
+        journal.record_page(make_page("https://example.com/a"))
+        journal.record_page(make_page("https://example.com/b", is_relevant=False))
+
+    with RunJournal("question", path=path, resume=True) as journal:
+        assert not journal.is_empty
+        assert journal.queries == plan("query1", "query2")
+        assert journal.search_results == {"query1": [result]}
+        assert journal.pages["https://example.com/a"].content == "Relevant passage"
+        assert journal.pages["https://example.com/b"].content is None
+
+
+def test_without_resume_starts_over(tmp_path):
+    path = tmp_path / "run.jsonl"
+    with RunJournal("question", path=path) as journal:
+        journal.record_queries(plan("query1"))
+
+    with RunJournal("question", path=path) as journal:
+        assert journal.is_empty
+
+    with RunJournal("question", path=path, resume=True) as journal:
+        assert journal.is_empty
+
+
+def test_resume_skips_truncated_entry(tmp_path):
+    path = tmp_path / "run.jsonl"
+    with RunJournal("question", path=path) as journal:
+        journal.record_queries(plan("query1"))
+    with open(path, "a") as f:
+        f.write('{"type": "search", "query": "query1", "res')
+
+    with RunJournal("question", path=path, resume=True) as journal:
+        assert journal.search_results == {}
+        journal.record_page(make_page("https://example.com/a"))
+
+    with RunJournal("question", path=path, resume=True) as journal:
+        assert journal.queries == plan("query1")
+        assert "https://example.com/a" in journal.pages
+
+
+def test_complete_removes_journal(tmp_path):
+    path = tmp_path / "run.jsonl"
+    journal = RunJournal("question", path=path)
+    journal.record_queries(plan("query1"))
+    journal.complete()
+
+    assert not path.exists()
+    journal.record_queries(plan("query2"))  # ignored after completion
+    assert not path.exists()
+
+
+def test_default_path_is_per_question():
+    first = RunJournal("first question")
+    second = RunJournal("second question")
+    first.close()
+    second.close()
+
+    assert first.path != second.path
+    assert first.path.parent == second.path.parent
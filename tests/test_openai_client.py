@@ -0,0 +1,137 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from askweb.models import AnalyzedContent, SearchResult
+from askweb.openai_client import OpenAIClient
+
+
+@pytest.fixture
+def openai_client():
+    with patch("askweb.openai_client.OpenAI"):
+        yield OpenAIClient("test-key")
+
+
+def make_source(i, size):
+    return AnalyzedContent(
+        title=f"Source {i}",
+        url=f"https://example.com/{i}",
+        published=None,
+        is_relevant=True,
+        content="x" * size,
+    )
+
+
+def test_answer_question_includes_every_source(openai_client):
+    completion = MagicMock()
+    completion.answer = "Test answer"
+    completion.used_sources = [3, 1, 3, 9]
+    sources = [make_source(0, 200), make_source(1, 300), make_source(2, 100)]
+
+    with patch.object(
+        openai_client, "_create_completion", return_value=completion
+    ) as mock_completion:
+        response = openai_client.answer_question(iter(sources), "test question")
+
+    prompt = mock_completion.call_args.kwargs["user_content"]
+    for i in range(3):
+        assert f"[{i + 1}]\ntitle: Source {i}" in prompt
+    assert response.answer == "Test answer"
+    # References come from the sources, in the order the model used them
+    assert [str(r.url) for r in response.references] == [
+        "https://example.com/2",
+        "https://example.com/0",
+    ]
+
+
+def snippet_results():
+    return [
+        SearchResult(title="Test Title", url="https://example.com", snippet="Fact"),
+        SearchResult(title="Other Title", url="https://example.org", snippet="More"),
+    ]
+
+
+def test_answer_from_snippets_sufficient(openai_client):
+    completion = MagicMock()
+    completion.is_sufficient = True
+    completion.answer = "Snippet answer"
+    completion.used_snippets = [2, 0, 2, 7]
+
+    with patch.object(
+        openai_client, "_create_completion", return_value=completion
+    ) as mock_completion:
+        response = openai_client.answer_from_snippets(snippet_results(), "question")
+
+    assert response.answer == "Snippet answer"
+    assert [(r.title, str(r.url)) for r in response.references] == [
+        ("Other Title", "https://example.org/")
+    ]
+    prompt = mock_completion.call_args.kwargs["user_content"]
+    assert "[1]\ntitle: Test Title" in prompt
+    assert "[2]\ntitle: Other Title" in prompt
+
+
+def test_answer_from_snippets_insufficient(openai_client):
+    completion = MagicMock()
+    completion.is_sufficient = False
+
+    with patch.object(openai_client, "_create_completion", return_value=completion):
+        assert openai_client.answer_from_snippets(snippet_results(), "q") is None
+
+
+def test_summarize_sources_takes_references_from_sources(openai_client):
+    completion = MagicMock()
+    completion.answer = "Partial answer"
+    completion.used_sources = [2, 0, 2, 7]
+    sources = [make_source(0, 10), make_source(1, 10)]
+
+    with patch.object(openai_client, "_create_completion", return_value=completion):
+        partial = openai_client.summarize_sources(sources, "test question")
+
+    assert partial.answer == "Partial answer"
+    assert [(r.title, str(r.url)) for r in partial.references] == [
+        ("Source 1", "https://example.com/1")
+    ]
+
+
+def test_generate_search_queries_orders_by_priority(openai_client):
+    def planned(query, priority, expected_results):
+        planned_query = MagicMock()
+        planned_query.query = query
+        planned_query.priority = priority
+        planned_query.expected_results = expected_results
+        return planned_query
+
+    completion = MagicMock()
+    completion.final_answer.queries = [
+        planned("details", 3, 2),
+        planned("main", 1, 50),
+        planned("context", 2, 0),
+    ]
+
+    with patch.object(openai_client, "_create_completion", return_value=completion):
+        queries = openai_client.generate_search_queries("test question")
+
+    assert [(q.query, q.priority, q.expected_results) for q in queries] == [
+        ("main", 1, 10),
+        ("context", 2, 1),
+        ("details", 3, 2),
+    ]
+
+
+def test_warm_up_opens_connections(openai_client):
+    models = openai_client.client.with_options.return_value.models
+    models.list.side_effect = [None, Exception("offline"), None]
+
+    openai_client.warm_up(connections=3)
+
+    assert models.list.call_count == 3
+
+
+def test_context_manager_closes_client():
+    with patch("askweb.openai_client.OpenAI") as mock_openai:
+        with OpenAIClient("test-key") as openai_client:
+            pass
+
+        assert openai_client.client is mock_openai.return_value
+        mock_openai.return_value.close.assert_called_once()
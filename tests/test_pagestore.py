@@ -0,0 +1,72 @@
+import os
+
+import pytest
+
+from askweb.models import AnalyzedContent, PageRecord
+from askweb.pagestore import PageStore
+
+
+@pytest.fixture
+def analyzed_content():
+    return AnalyzedContent(
+        title="Test Title",
+        url="https://example.com",
+        published="2024-01-01",
+        is_relevant=True,
+        content="Test content",
+    )
+
+
+def test_put_and_get_in_memory():
+    with PageStore(memory_limit=1024) as store:
+        key = store.put("Test content")
+
+        assert store.get(key) == "Test content"
+        assert store.memory_used == len("Test content")
+        assert store.spilled == 0
+
+
+def test_spills_over_memory_limit():
+    with PageStore(memory_limit=10) as store:
+        first = store.put("12345678")
+        second = store.put("spilled to disk")
+
+        assert store.memory_used == 8
+        assert store.spilled == 1
+        assert store.get(first) == "12345678"
+        assert store.get(second) == "spilled to disk"
+
+        spill_dir = store._spill_dir
+        assert os.path.isdir(spill_dir)
+
+    assert not os.path.exists(spill_dir)
+
+
+def test_add_and_load_round_trip(analyzed_content):
+    with PageStore(memory_limit=0) as store:
+        record = store.add(analyzed_content)
+
+        assert isinstance(record, PageRecord)
+        assert not hasattr(record, "__dict__")
+        assert record.body_key is not None
+        assert store.load(record) == analyzed_content
+
+
+def test_add_without_content(analyzed_content):
+    analyzed_content.content = None
+    with PageStore() as store:
+        record = store.add(analyzed_content)
+
+        assert record.body_key is None
+        assert store.load(record).content is None
+
+
+def test_contents_sequence(analyzed_content):
+    with PageStore() as store:
+        records = [store.add(analyzed_content) for _ in range(3)]
+        contents = store.contents(records)
+
+        assert len(contents) == 3
+        assert list(contents) == [analyzed_content] * 3
+        assert contents[1] == analyzed_content
+        assert contents[:2] == [analyzed_content] * 2
@@ -0,0 +1,255 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from askweb.models import (
+    AnalyzedContent,
+    PlannedQuery,
+    SearchResponse,
+    SearchResult,
+)
+from askweb.pipeline import Pipeline, PipelineOptions, ask
+
+
+def plan(*queries):
+    return [
+        PlannedQuery(query=query, priority=1, expected_results=5) for query in queries
+    ]
+
+
+@pytest.fixture
+def components():
+    with (
+        patch("askweb.pipeline.WebSearcher") as mock_searcher,
+        patch("askweb.pipeline.ContentExtractor") as mock_extractor,
+        patch("askweb.pipeline.ContentAnalyzer") as mock_analyzer,
+        patch("askweb.pipeline.ContentIndex"),
+        patch("askweb.pipeline.QuestionCache") as mock_cache,
+        patch("askweb.pipeline.FetchScheduler") as mock_fetch_scheduler,
+    ):
+        mock_cache.return_value.lookup.return_value = None
+        mock_cache.return_value.stats.return_value = (0, 1)
+        mock_fetch_scheduler.return_value.order.side_effect = list
+        yield {
+            "searcher": mock_searcher.return_value,
+            "extractor": mock_extractor.return_value,
+            "analyzer": mock_analyzer.return_value,
+        }
+
+
+def test_ask_requires_api_key():
+    with patch.dict("os.environ", {}, clear=True):
+        with pytest.raises(ValueError):
+            ask("test question")
+
+
+def test_pipeline_reports_events_in_order(components):
+    openai_client = MagicMock()
+    openai_client.embed.return_value = [[0.1, 0.2]]
+    openai_client.generate_search_queries.return_value = plan("query1")
+    components["searcher"].search.return_value = [
+        SearchResult(title="Source", url="https://example.com", snippet="Snippet")
+    ]
+    content = AnalyzedContent(
+        title="Source",
+        url="https://example.com",
+        published=None,
+        is_relevant=True,
+        content="Test content",
+    )
+    components["extractor"].extract.return_value = content
+    components["analyzer"].analyze_content.return_value = content
+    response = SearchResponse(question="test question", answer="Answer", references=[])
+    components["analyzer"].create_search_response.return_value = response
+
+    received = []
+    result = Pipeline(
+        "test question", openai_client, PipelineOptions(workers=1), received.append
+    ).run()
+
+    assert result.response == response
+    assert result.events == received
+    steps = [(event.stage, event.kind) for event in result.events]
+    for earlier, later in [
+        (("queries", "end"), ("search", "start")),
+        (("search", "end"), ("analysis", "start")),
+        (("analysis", "end"), ("answer", "start")),
+    ]:
+        assert steps.index(earlier) < steps.index(later)
+    assert steps[-1] == ("answer", "result")
+    assert result.events[-1].data["response"]["answer"] == "Answer"
+    elapsed = [event.elapsed for event in result.events]
+    assert elapsed == sorted(elapsed)
+
+
+def test_pipeline_without_sources_has_no_response(components):
+    openai_client = MagicMock()
+    openai_client.generate_search_queries.return_value = plan("query1")
+    components["searcher"].search.return_value = []
+
+    result = Pipeline("test question", openai_client).run()
+
+    assert result.response is None
+    assert result.events[-1].message == "No relevant answers found."
+
+
+def test_pipeline_resumes_interrupted_run(components):
+    openai_client = MagicMock()
+    openai_client.embed.side_effect = RuntimeError("no embeddings")
+    openai_client.generate_search_queries.return_value = plan("query1")
+    components["searcher"].search.return_value = [
+        SearchResult(title=f"Source {i}", url=f"https://example.com/{i}", snippet="")
+        for i in range(2)
+    ]
+
+    def make_content(result):
+        return AnalyzedContent(
+            title=result.title,
+            url=result.url,
+            published=None,
+            is_relevant=True,
+            content="Test content",
+        )
+
+    components["extractor"].extract.side_effect = make_content
+    components["analyzer"].analyze_content.side_effect = [
+        make_content(components["searcher"].search.return_value[0]),
+        RuntimeError("rate limited"),
+    ]
+    with pytest.raises(RuntimeError):
+        Pipeline("test question", openai_client, PipelineOptions(workers=1)).run()
+
+    components["searcher"].search.reset_mock()
+    components["extractor"].extract.reset_mock()
+    components["analyzer"].analyze_content.side_effect = lambda content, _: content
+    components["analyzer"].create_search_response.return_value = SearchResponse(
+        question="test question", answer="Answer", references=[]
+    )
+    result = Pipeline(
+        "test question", openai_client, PipelineOptions(workers=1, resume=True)
+    ).run()
+
+    assert result.response.answer == "Answer"
+    assert openai_client.generate_search_queries.call_count == 1
+    components["searcher"].search.assert_not_called()
+    components["extractor"].extract.assert_called_once()
+    sources = components["analyzer"].create_search_response.call_args[0][0]
+    assert len(sources) == 2
+    assert any(event.stage == "journal" for event in result.events)
+
+
+def test_search_skips_low_priority_queries_within_budget(components):
+    openai_client = MagicMock()
+    openai_client.generate_search_queries.return_value = [
+        PlannedQuery(query="main", priority=1, expected_results=3),
+        PlannedQuery(query="context", priority=2, expected_results=8),
+        PlannedQuery(query="details", priority=3, expected_results=2),
+    ]
+
+    def search(query, max_results):
+        return [
+            SearchResult(title=query, url=f"https://{query}.com/{i}", snippet="")
+            for i in range(max_results)
+        ]
+
+    components["searcher"].search.side_effect = search
+    pipeline = Pipeline(
+        "test question", openai_client, PipelineOptions(max_results=5, max_fetches=6)
+    )
+
+    results = pipeline.search_web()
+
+    assert components["searcher"].search.call_args_list == [
+        (("main",), {"max_results": 3}),
+        (("context",), {"max_results": 5}),
+    ]
+    # The budget keeps all results of the higher priority query
+    assert len(results) == 6
+    assert sum(r.title == "main" for r in results) == 3
+    skipped = [e for e in pipeline.events if e.data.get("skipped")]
+    assert [e.data["query"] for e in skipped] == ["details"]
+
+
+def test_snippets_keep_search_priority_order(components):
+    openai_client = MagicMock()
+    openai_client.embed.return_value = [[0.1, 0.2]]
+    openai_client.generate_search_queries.return_value = [
+        PlannedQuery(query="details", priority=2, expected_results=5),
+        PlannedQuery(query="main", priority=1, expected_results=5),
+    ]
+    found = {
+        "main": [
+            SearchResult(title="Z", url="https://z.com", snippet="Best"),
+            SearchResult(title="B", url="https://b.com", snippet="Good"),
+        ],
+        "details": [
+            SearchResult(title="A", url="https://a.com", snippet="Extra"),
+            SearchResult(title="Z", url="https://z.com", snippet="Best"),
+        ],
+    }
+    components["searcher"].search.side_effect = lambda query, **_: found[query]
+    openai_client.answer_from_snippets.return_value = SearchResponse(
+        question="test question", answer="Snippet answer", references=[]
+    )
+
+    Pipeline("test question", openai_client, PipelineOptions(fast=True)).run()
+
+    results = openai_client.answer_from_snippets.call_args[0][0]
+    assert [str(r.url) for r in results] == [
+        "https://z.com/",
+        "https://b.com/",
+        "https://a.com/",
+    ]
+
+
+def test_pipeline_warms_up_while_planning(components):
+    openai_client = MagicMock()
+    openai_client.generate_search_queries.return_value = plan("query1")
+    components["searcher"].search.return_value = []
+
+    Pipeline(
+        "test question", openai_client, PipelineOptions(workers=8, warm_up=True)
+    ).run()
+
+    openai_client.warm_up.assert_called_once_with(4)
+    components["searcher"].warm_up.assert_called_once()
+
+
+def test_pipeline_passes_block_hours_to_blocklist(components):
+    with (
+        patch("askweb.pipeline.DomainBlocklist") as mock_blocklist,
+        patch("askweb.pipeline.ContentExtractor") as mock_extractor,
+    ):
+        pipeline = Pipeline(
+            "test question", MagicMock(), PipelineOptions(block_hours=1)
+        )
+        pipeline.journal.close()
+
+    mock_blocklist.assert_called_once_with(block_hours=1)
+    blocklist = mock_extractor.call_args.kwargs["blocklist"]
+    assert blocklist is mock_blocklist.return_value
+
+
+def test_ask_leaves_shared_clients_open(components):
+    openai_client = MagicMock()
+    openai_client.generate_search_queries.return_value = plan("query1")
+    searcher = MagicMock()
+    searcher.search.return_value = []
+
+    ask("test question", openai_client=openai_client, searcher=searcher)
+
+    searcher.search.assert_called_once()
+    searcher.close.assert_not_called()
+    openai_client.close.assert_not_called()
+
+
+def test_ask_closes_its_own_clients(components):
+    with patch("askweb.pipeline.OpenAIClient") as mock_openai:
+        openai_client = mock_openai.return_value.__enter__.return_value
+        openai_client.generate_search_queries.return_value = plan("query1")
+        components["searcher"].search.return_value = []
+
+        ask("test question", api_key="test-key")
+
+    mock_openai.return_value.__exit__.assert_called_once()
+    components["searcher"].close.assert_called_once()
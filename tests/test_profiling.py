@@ -0,0 +1,83 @@
+import pstats
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from askweb import profiling
+from askweb.profiling import PROFILE_ALL_THREADS, StageProfiler, propagate, stage
+
+
+def busy(seconds):
+    data = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        data.append("x" * 100)
+    return len(data)
+
+
+def test_stage_without_profiler_is_noop():
+    with stage("search"):
+        pass
+    assert propagate(busy) is busy
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        StageProfiler("gpu", "out")
+
+
+def test_profiles_stages_and_worker_threads(tmp_path):
+    with StageProfiler("both", tmp_path) as profiler:
+        with stage("search"):
+            busy(0.05)
+        with stage("answer"):
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                list(executor.map(propagate(busy), [0.05, 0.05]))
+
+    assert profiling._active is None
+    for name in ("search", "answer"):
+        stats = pstats.Stats(str(tmp_path / f"{name}.pstats"))
+        assert any(func[2] == "busy" for func in stats.stats)
+        assert (tmp_path / f"{name}.txt").exists()
+
+    stacks = (tmp_path / "stacks.collapsed").read_text().splitlines()
+    assert stacks
+    assert {line.split(";")[0] for line in stacks} <= {"search", "answer"}
+    assert any("busy" in line for line in stacks if line.startswith("answer;"))
+    assert profiler.current_stage() is None
+
+    memory = (tmp_path / "memory.txt").read_text()
+    assert "== search: peak" in memory
+    assert "== answer: peak" in memory
+
+
+def test_stages_of_worker_threads(tmp_path):
+    def extract(seconds):
+        with stage("extraction"):
+            return busy(seconds)
+
+    with StageProfiler("cpu", tmp_path):
+        with stage("analysis"):
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                list(executor.map(extract, [0.1, 0.1]))
+
+    # From 3.12 the worker threads are profiled by the analysis stage
+    expected = {"analysis.pstats"}
+    if not PROFILE_ALL_THREADS:
+        expected.add("extraction.pstats")
+    assert {path.name for path in tmp_path.glob("*.pstats")} == expected
+    stats = pstats.Stats(str(tmp_path / "analysis.pstats"))
+    assert any(func[2] == "busy" for func in stats.stats) == PROFILE_ALL_THREADS
+
+    summary = (tmp_path / "extraction.samples.txt").read_text()
+    assert "busy (test_profiling.py" in summary
+
+
+def test_cpu_mode_skips_memory(tmp_path):
+    with StageProfiler("cpu", tmp_path):
+        with stage("search"):
+            busy(0.01)
+
+    assert (tmp_path / "search.pstats").exists()
+    assert not (tmp_path / "memory.txt").exists()
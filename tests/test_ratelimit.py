@@ -0,0 +1,141 @@
+from unittest.mock import MagicMock, patch
+
+import httpx
+import pytest
+from openai import RateLimitError
+
+from askweb.openai_client import OpenAIClient
+from askweb.ratelimit import (
+    RateLimitScheduler,
+    parse_reset_duration,
+    parse_retry_after,
+)
+
+
+def rate_limit_error(headers, code=None):
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    response = httpx.Response(429, headers=headers, request=request)
+    body = {"code": code} if code else None
+    return RateLimitError("Rate limit reached", response=response, body=body)
+
+
+@pytest.fixture
+def openai_client():
+    with patch("askweb.openai_client.OpenAI") as mock_openai:
+        client = OpenAIClient("test-key", scheduler=RateLimitScheduler(base_delay=0))
+        yield client, mock_openai.return_value
+
+
+def test_parse_reset_duration():
+    assert parse_reset_duration("1s") == 1.0
+    assert parse_reset_duration("6m0s") == 360.0
+    assert parse_reset_duration("20ms") == pytest.approx(0.02)
+    assert parse_reset_duration("1h2m3.5s") == pytest.approx(3723.5)
+    assert parse_reset_duration(None) is None
+    assert parse_reset_duration("soon") is None
+
+
+def test_parse_retry_after():
+    assert parse_retry_after({"retry-after-ms": "1500"}) == 1.5
+    assert parse_retry_after({"retry-after": "3"}) == 3.0
+    assert parse_retry_after({}) is None
+    assert parse_retry_after(None) is None
+
+
+def test_update_from_headers():
+    scheduler = RateLimitScheduler()
+    scheduler.update(
+        {
+            "x-ratelimit-remaining-requests": "0",
+            "x-ratelimit-reset-requests": "2s",
+            "x-ratelimit-remaining-tokens": "5000",
+            "x-ratelimit-reset-tokens": "1s",
+        }
+    )
+
+    assert scheduler.remaining_requests == 0
+    assert scheduler.remaining_tokens == 5000
+    # Requests budget exhausted until the reset window passes
+    assert 1.0 < scheduler._budget_wait(0) <= 2.0
+
+
+def test_token_budget_wait():
+    scheduler = RateLimitScheduler()
+    scheduler.update(
+        {"x-ratelimit-remaining-tokens": "100", "x-ratelimit-reset-tokens": "5s"}
+    )
+
+    assert scheduler._budget_wait(50) <= 0
+    assert scheduler._budget_wait(500) > 4.0
+
+
+def test_aimd_concurrency():
+    scheduler = RateLimitScheduler(
+        initial_concurrency=4, min_concurrency=1, max_concurrency=8
+    )
+
+    for _ in range(4):
+        scheduler.record_success()
+    assert 4.5 < scheduler.concurrency < 5.5
+
+    scheduler.record_rate_limited()
+    assert scheduler.concurrency < 3.0
+
+    for _ in range(5):
+        scheduler.record_rate_limited()
+    assert scheduler.concurrency == 1.0
+
+    for _ in range(1000):
+        scheduler.record_success()
+    assert scheduler.concurrency == 8.0
+
+
+def test_backoff_respects_retry_after():
+    scheduler = RateLimitScheduler(base_delay=1.0, max_delay=4.0)
+
+    for attempt in range(10):
+        assert 0 <= scheduler.backoff(attempt) <= 4.0
+    assert scheduler.backoff(0, retry_after=10.0) >= 10.0
+
+
+def test_create_completion_retries_rate_limit(openai_client):
+    client, mock_openai = openai_client
+    create = mock_openai.beta.chat.completions.with_raw_response.parse
+    raw_response = MagicMock()
+    raw_response.headers = {"x-ratelimit-remaining-requests": "10"}
+    raw_response.parse.return_value.choices[0].message.parsed = "parsed"
+    create.side_effect = [rate_limit_error({"retry-after-ms": "1"}), raw_response]
+
+    with patch("askweb.openai_client.time.sleep") as mock_sleep:
+        result = client._create_completion("system", "user")
+
+    assert result == "parsed"
+    assert create.call_count == 2
+    mock_sleep.assert_called_once()
+    assert client.scheduler.remaining_requests == 10
+    assert client.scheduler.in_flight == 0
+
+
+def test_create_completion_gives_up_after_max_retries(openai_client):
+    client, mock_openai = openai_client
+    client.max_retries = 2
+    create = mock_openai.beta.chat.completions.with_raw_response.parse
+    create.side_effect = rate_limit_error({})
+
+    with patch("askweb.openai_client.time.sleep"):
+        with pytest.raises(RateLimitError):
+            client._create_completion("system", "user")
+
+    assert create.call_count == 3
+    assert client.scheduler.in_flight == 0
+
+
+def test_create_completion_does_not_retry_quota_error(openai_client):
+    client, mock_openai = openai_client
+    create = mock_openai.beta.chat.completions.with_raw_response.parse
+    create.side_effect = rate_limit_error({}, code="insufficient_quota")
+
+    with pytest.raises(RateLimitError):
+        client._create_completion("system", "user")
+
+    assert create.call_count == 1
@@ -1,3 +1,5 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import MagicMock, patch
 
 import pytest
@@ -44,3 +46,93 @@ def test_search_error():
         results = searcher.search("test query")
 
         assert len(results) == 0
+
+
+def test_search_pauses_between_queries(mock_ddgs_response):
+    with (
+        patch("askweb.search.DDGS") as mock_ddgs,
+        patch("askweb.search.time.sleep") as mock_sleep,
+    ):
+        mock_ddgs.return_value.text.return_value = mock_ddgs_response
+
+        searcher = WebSearcher(max_results=1)
+        searcher.search("first query")
+        mock_sleep.assert_not_called()
+
+        searcher.search("second query")
+        mock_sleep.assert_called_once()
+        assert 4 < mock_sleep.call_args[0][0] <= 10
+
+
+def test_search_max_results_override(mock_ddgs_response):
+    with patch("askweb.search.DDGS") as mock_ddgs:
+        mock_ddgs.return_value.text.return_value = mock_ddgs_response
+
+        searcher = WebSearcher(max_results=5)
+        searcher.search("test query", max_results=2)
+
+        mock_ddgs.return_value.text.assert_called_once_with(
+            "test query", region="us-en", safesearch="off", max_results=2
+        )
+
+
+def test_search_reuses_client_across_queries_and_retries(mock_ddgs_response):
+    with (
+        patch("askweb.search.DDGS") as mock_ddgs,
+        patch("askweb.search.time.sleep"),
+    ):
+        mock_ddgs.return_value.text.side_effect = [
+            Exception("Search failed"),
+            mock_ddgs_response,
+            mock_ddgs_response,
+        ]
+
+        with WebSearcher(max_results=1) as searcher:
+            searcher.search("first query")
+            searcher.search("second query")
+
+        mock_ddgs.assert_called_once()
+        assert mock_ddgs.return_value.text.call_count == 3
+        assert searcher._ddgs is None
+
+
+def test_warm_up_connects_to_first_engines():
+    engine = MagicMock()
+    engine.search_url = "https://{lang}.wikipedia.org/w/api.php?search={query}"
+    failing_engine = MagicMock()
+    failing_engine.search_url = "https://grokipedia.com/api/typeahead"
+    failing_engine.http_client.request.side_effect = Exception("offline")
+    shuffled_engine = MagicMock()
+    shuffled_engine.search_url = "https://html.duckduckgo.com/html/"
+
+    with patch("askweb.search.DDGS") as mock_ddgs:
+        mock_ddgs.return_value._get_engines.return_value = [
+            engine,
+            failing_engine,
+            shuffled_engine,
+        ]
+
+        searcher = WebSearcher(max_results=10)
+        searcher.warm_up()
+
+        engine.http_client.request.assert_called_once_with(
+            "HEAD", "https://en.wikipedia.org/", timeout=5
+        )
+        failing_engine.http_client.request.assert_called_once()
+        # Only the first batch of a search is known in advance
+        shuffled_engine.http_client.request.assert_not_called()
+        mock_ddgs.assert_called_once()
+
+
+def test_client_is_created_once_across_threads():
+    def create():
+        time.sleep(0.01)
+        return MagicMock()
+
+    with patch("askweb.search.DDGS", side_effect=create) as mock_ddgs:
+        searcher = WebSearcher()
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            clients = list(executor.map(lambda _: searcher.ddgs, range(4)))
+
+    mock_ddgs.assert_called_once()
+    assert all(client is clients[0] for client in clients)
@@ -0,0 +1,103 @@
+from unittest.mock import MagicMock
+
+from askweb.models import AnalyzedContent, PartialAnswer, Reference
+from askweb.synthesis import group_by_budget, synthesize_answer
+
+
+def make_source(i, size=100):
+    return AnalyzedContent(
+        title=f"Source {i}",
+        url=f"https://example.com/{i}",
+        published=None,
+        is_relevant=True,
+        content="x" * size,
+    )
+
+
+def fake_summarize(sources, question):
+    return PartialAnswer(
+        answer=f"Partial from {len(sources)} sources",
+        references=[Reference(title=s.title, url=s.url) for s in sources],
+    )
+
+
+def test_group_by_budget():
+    assert group_by_budget([3, 3, 3, 5, 20, 1], 7) == [[0, 1], [2], [3], [4], [5]]
+    assert group_by_budget([], 10) == []
+
+
+def test_small_source_sets_use_single_prompt():
+    openai_client = MagicMock()
+    sources = [make_source(i) for i in range(3)]
+
+    synthesize_answer(openai_client, sources, "question", group_tokens=1000)
+
+    openai_client.answer_question.assert_called_once_with(sources, "question")
+    openai_client.summarize_sources.assert_not_called()
+
+
+def test_map_reduce_preserves_references():
+    openai_client = MagicMock()
+    openai_client.summarize_sources.side_effect = fake_summarize
+    openai_client.combine_answers.return_value = "Combined answer"
+    sources = [make_source(i, size=300) for i in range(5)]
+
+    # Each source is ~85 tokens, so groups hold two sources
+    response = synthesize_answer(
+        openai_client, sources, "question", group_tokens=200, workers=2
+    )
+
+    assert openai_client.summarize_sources.call_count == 3
+    openai_client.answer_question.assert_not_called()
+    assert response.answer == "Combined answer"
+    assert [str(r.url) for r in response.references] == [
+        f"https://example.com/{i}" for i in range(5)
+    ]
+
+
+def test_map_reduce_combines_in_levels():
+    openai_client = MagicMock()
+    openai_client.summarize_sources.side_effect = lambda sources, _: PartialAnswer(
+        answer="a" * 500,
+        references=[Reference(title=s.title, url=s.url) for s in sources],
+    )
+    openai_client.combine_answers.side_effect = lambda partials, _: "b" * 100
+    sources = [make_source(i, size=700) for i in range(8)]
+
+    response = synthesize_answer(openai_client, sources, "question", group_tokens=250)
+
+    # 8 partial answers are combined in pairs first, then in one final call
+    assert openai_client.summarize_sources.call_count == 8
+    assert openai_client.combine_answers.call_count == 5
+    assert len(response.references) == 8
+
+
+def test_map_reduce_combines_oversized_partials_in_pairs():
+    openai_client = MagicMock()
+    openai_client.summarize_sources.side_effect = lambda sources, _: PartialAnswer(
+        answer="a" * 900,
+        references=[Reference(title=s.title, url=s.url) for s in sources],
+    )
+    openai_client.combine_answers.side_effect = lambda partials, _: "b" * 900
+    sources = [make_source(i, size=700) for i in range(5)]
+
+    response = synthesize_answer(openai_client, sources, "question", group_tokens=250)
+
+    # No two partial answers fit the budget, so none is combined with more
+    # than one other: 5 -> 3 -> 2 -> 1
+    group_sizes = [len(c.args[0]) for c in openai_client.combine_answers.call_args_list]
+    assert max(group_sizes) == 2
+    assert openai_client.combine_answers.call_count == 4
+    assert len(response.references) == 5
+
+
+def test_forced_map_reduce_with_one_group():
+    openai_client = MagicMock()
+    openai_client.summarize_sources.side_effect = fake_summarize
+    sources = [make_source(i) for i in range(2)]
+
+    response = synthesize_answer(openai_client, sources, "question", mode="map-reduce")
+
+    openai_client.combine_answers.assert_not_called()
+    assert response.answer == "Partial from 2 sources"
+    assert len(response.references) == 2